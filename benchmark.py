@@ -0,0 +1,194 @@
+"""
+Benchmarks for PyGraphica, which draw in headless windows so no display is needed. They can be run with:
+    python -m PyGraphica.benchmark
+Results can be saved as JSON, and compared with results saved earlier to catch anything that has become slower:
+    python -m PyGraphica.benchmark --output baseline.json
+    python -m PyGraphica.benchmark --baseline baseline.json
+"""
+
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from PyGraphica import draw, colours
+
+#Code timed in a new Python process for each import benchmark, so modules imported by earlier benchmarks aren't already loaded
+imports = {
+    "import colours": "from PyGraphica import colours",
+    "import draw": "from PyGraphica import draw",
+    "import and collide": "from PyGraphica import draw\nclass box:\n    x1, y1, x2, y2 = 0, 0, 10, 10\ndraw.collision(box,box)",
+    "first window": "from PyGraphica import draw\ndraw.window(headless=True)",
+}
+
+#Seconds taken to run some code in a new Python process, as the median of several runs so one slow start doesn't skew it
+def time_code(code, runs=5):
+    script = "import time\nstart = time.perf_counter()\n" + code + "\nprint(time.perf_counter() - start)"
+    times = []
+    for run in range(runs):
+        output = subprocess.run([sys.executable,"-c",script],capture_output=True,text=True,check=True).stdout
+        times.append(float(output.split()[-1]))
+    return(statistics.median(times))
+
+#Seconds taken by each import benchmark
+def import_times(runs=5):
+    return({name:time_code(code,runs) for name,code in imports.items()})
+
+#Functions adding one object of each kind to a window at a random place, given the window, a random number generator and an image file
+def add_rect(window, rng, path):
+    x, y = rng.randint(0,760), rng.randint(0,560)
+    draw.rect(window,x,y,x+rng.randint(5,40),y+rng.randint(5,40),colours.BLUE,colours.WHITE)
+
+def add_line(window, rng, path):
+    draw.line(window,rng.randint(0,800),rng.randint(0,600),rng.randint(0,800),rng.randint(0,600),colours.YELLOW)
+
+def add_text(window, rng, path):
+    draw.text(window,rng.randint(0,700),rng.randint(0,580),14,colours.WHITE,"Label "+str(rng.randint(0,999)))
+
+def add_textbox(window, rng, path):
+    draw.textbox(window,rng.randint(0,700),rng.randint(0,580),14,80)
+
+def add_image(window, rng, path):
+    draw.image(window,path,rng.randint(0,760),rng.randint(0,560),rng.choice([16,24,32]))
+
+scenes = {
+    "rect": add_rect,
+    "line": add_line,
+    "text": add_text,
+    "textbox": add_textbox,
+    "image": add_image,
+}
+
+#Seconds per frame (the median of frames frames) for a window drawing count objects made by add, after a few frames to fill the caches
+def time_scene(add, count, frames, path):
+    rng = random.Random(1)
+    window = draw.window("benchmark",(800,600),headless=True)
+    for i in range(count):
+        add(window,rng,path)
+    for i in range(5):
+        window.update()
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        window.update()
+        times.append(time.perf_counter() - start)
+    #Free the window's surface, so each scene doesn't keep the memory of the ones before it
+    window.backend.close()
+    return(statistics.median(times))
+
+#Seconds per call of function, the best of several repeats of enough calls to take a noticeable time
+def time_call(function, repeats=5):
+    timer = timeit.Timer(function)
+    number = timer.autorange()[0]
+    return(min(timer.repeat(repeats,number))/number)
+
+#Seconds per call of the functions used for coordinates, collision, input and ordering, with count shapes in the window
+def micro_times(count, path):
+    window = draw.window("benchmark",(800,600),headless=True)
+    shapes = [draw.rect(window,i%800,i%600,i%800+20,i%600+20,colours.RED) for i in range(count)]
+    rng = random.Random(1)
+    results = {}
+    #Coordinates are worked out once per window size, so both the cached and uncached paths are timed
+    results["make_pos px"] = time_call(lambda: draw.make_pos(window,(120,340)))
+    results["make_pos %"] = time_call(lambda: draw.make_pos(window,("15","60")))
+    results["resolve_pos px"] = time_call(lambda: draw.resolve_pos(window,(120,340)))
+    results["resolve_pos %"] = time_call(lambda: draw.resolve_pos(window,("15","60")))
+    results["collision"] = time_call(lambda: draw.collision(shapes[0],shapes[1]))
+    results["keys"] = time_call(lambda: draw.keys(False))
+    #A frame reading ten key presses and the text they type
+    def typing():
+        for key in "benchmarks":
+            event = draw.sdl2.SDL_Event()
+            event.type = draw.sdl2.SDL_KEYDOWN
+            event.key.keysym.scancode = draw.sdl2.SDL_GetScancodeFromName(key.encode())
+            draw.sdl2.SDL_PushEvent(event)
+            event = draw.sdl2.SDL_Event()
+            event.type = draw.sdl2.SDL_TEXTINPUT
+            event.text.text = key.encode()
+            draw.sdl2.SDL_PushEvent(event)
+        window.update()
+    for shape in shapes:
+        shape.visible = False
+    results["key events frame"] = time_call(typing)
+    results["to_front"] = time_call(lambda: draw.to_front(rng.choice(shapes)))
+    results["to_back"] = time_call(lambda: draw.to_back(rng.choice(shapes)))
+    #Images are only decoded when first drawn, so each one is drawn in a frame, then deleted and dropped from the image cache so the next is decoded again
+    def load_image():
+        picture = draw.image(window,path,10,10,32)
+        window.update()
+        draw.delete(picture)
+        draw.image_cache.discard((os.path.abspath(path),picture.width,picture.height))
+    results["image first draw"] = time_call(load_image)
+    window.backend.close()
+    return(results)
+
+#Seconds taken by every benchmark, by name
+def run(count=200, frames=100, include_imports=True):
+    results = {}
+    if include_imports:
+        results.update(import_times())
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,"benchmark.png")
+        draw.Image.new("RGB",(64,64),colours.GREEN).save(path)
+        for name, add in scenes.items():
+            results[name+" frame"] = time_scene(add,count,frames,path)
+        results.update(micro_times(count,path))
+    return(results)
+
+#Change in each result from a baseline, as a fraction of the baseline's time, so 0.1 is 10% slower
+def compare(results, baseline):
+    return({name:seconds/baseline[name] - 1 for name,seconds in results.items() if baseline.get(name)})
+
+#Time in the most readable unit
+def show_time(seconds):
+    if seconds >= 0.001:
+        return(format(seconds*1000,".2f") + "ms")
+    return(format(seconds*1000000,".2f") + "us")
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Time PyGraphica's drawing, input and collision code without a display.")
+    parser.add_argument("--count",type=int,default=200,help="objects drawn in each scene (default 200)")
+    parser.add_argument("--frames",type=int,default=100,help="frames timed for each scene (default 100)")
+    parser.add_argument("--output",help="file to save the results in as JSON")
+    parser.add_argument("--baseline",help="JSON file of earlier results to compare with")
+    parser.add_argument("--threshold",type=float,default=0.1,help="fraction slower than the baseline that counts as a regression (default 0.1)")
+    parser.add_argument("--no-imports",action="store_true",help="skip timing imports in new processes")
+    options = parser.parse_args(arguments)
+
+    results = run(options.count,options.frames,not options.no_imports)
+    changes = {}
+    if options.baseline:
+        with open(options.baseline) as file:
+            changes = compare(results,json.load(file)["results"])
+    regressions = [name for name,change in changes.items() if change > options.threshold]
+
+    for name, seconds in results.items():
+        line = name.ljust(20) + show_time(seconds).rjust(12)
+        if name.endswith(" frame"):
+            line += (format(1/seconds,".0f") + "fps").rjust(10)
+        if name in changes:
+            line += format(changes[name],"+.1%").rjust(10) + (" SLOWER" if name in regressions else "")
+        print(line)
+
+    if options.output:
+        with open(options.output,"w") as file:
+            json.dump({
+                "python":platform.python_version(),
+                "platform":platform.platform(),
+                "count":options.count,
+                "frames":options.frames,
+                "results":results,
+            },file,indent=4)
+    #A non-zero exit status lets scripts stop when anything has become slower
+    return(1 if regressions else 0)
+
+if __name__ == "__main__":
+    sys.exit(main())
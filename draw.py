@@ -5,10 +5,14 @@ by Luke Campbell
 PyGraphica is a simple GUI and game library designed for Python. It works off the following classes:
     -   Window
     -   line
+    -   lines
     -   rect
+    -   rect_batch
     -   text
     -   textbox
+    -   textarea
     -   image
+    -   sprite
 And the following functions:
     -   touching
     -   to_front
@@ -18,17 +22,50 @@ See the README file for more details and instructions
 """
 
 
-import sdl2
-import sdl2.ext
 import time
 import ctypes
 import os
+import sys
+import collections
+import itertools
+import importlib
+import importlib.util
+import queue
+import threading
 from PyGraphica import colours,origins,fonts
-from PIL import Image
+
+#Stand-in for a module that is imported the first time it is used, then puts the real module in its place, so programs that only use collision() or colours don't wait for SDL and PIL to load
+class lazy_module:
+    def __init__(self, name, *modules):
+        self.__name = name
+        #Modules imported together, the first of which replaces the stand-in
+        self.__modules = modules
+
+    def __getattr__(self, attribute):
+        for module in reversed(self.__modules):
+            loaded = importlib.import_module(module)
+        globals()[self.__name] = loaded
+        return(getattr(loaded,attribute))
+
+sdl2 = lazy_module("sdl2","sdl2","sdl2.ext","sdl2.sdlttf")
+Image = lazy_module("Image","PIL.Image")
+futures = lazy_module("futures","concurrent.futures")
+#NumPy is only needed for the batch collision functions
+numpy = lazy_module("numpy","numpy")
+has_numpy = importlib.util.find_spec("numpy") is not None
 
 class window:
-    #Restart the window, used when the window is started or resized (as resize requires restart)
+    #Open the window, or set up drawing in memory if it is headless
     def start(self):
+        if self.backend:
+            self.backend.close()
+        #Headless windows draw onto a surface in memory, and only need SDL's event queue
+        if self.headless:
+            sdl2.SDL_Init(sdl2.SDL_INIT_EVENTS)
+            self.__window = None
+            self.backend = offscreen_backend(self.width,self.height)
+            self.surface = self.backend.surface
+            return
         sdl2.ext.init()
         if self.resizable:
             self.__window = sdl2.ext.Window(self.name, (self.width, self.height), flags=sdl2.SDL_WINDOW_RESIZABLE, position=self.position)
@@ -39,17 +76,29 @@ class window:
                 self.__window.window,
                 sdl2.ext.image.load_img(self.icon)
             )
-        self.surface = self.__window.get_surface()
+        #Everything is drawn through the backend, either straight onto the window's surface or with an SDL renderer
+        if self.renderer:
+            self.backend = renderer_backend(self.__window,self.renderer == "software")
+            self.surface = None
+        else:
+            self.backend = surface_backend(self.__window)
+            self.surface = self.backend.surface
         self.__window.show()
+        #Typed characters arrive as text input events, so textboxes don't miss keys pressed between frames
+        sdl2.SDL_StartTextInput()
     
     #Initialise window class
-    def __init__(self, name="PyGraphica", size=(800,600), resizable=False, icon=False, position=(0,20), origin=origins.TOP_LEFT, colour=colours.BLACK):
+    def __init__(self, name="PyGraphica", size=(800,600), resizable=False, icon=False, position=(0,20), origin=origins.TOP_LEFT, colour=colours.BLACK, dirty_rects=False, fps=False, profile=False, renderer=False, headless=False, culling=False):
         self.name = name
         self.width = size[0]
         self.height = size[1]
         self.resizable = resizable
         self.icon = icon
         self.position = position
+        #px values of coordinates and lengths already used with this window's size and origin
+        self.coord_cache = {}
+        self.width_cache = {}
+        self.height_cache = {}
         self.origin = origin
         self.colour = colour
         #Keys pressed
@@ -58,25 +107,177 @@ class window:
         self.key_changes = []
         self.comm_changes = []
         self.caps = False
+        #Ordered (kind, key) events from this frame, where kind is "down", "repeat", "up" or "text" (for typed text)
+        self.key_events = []
+        #Events waiting to be read at the end of the next update, and scancodes currently held down
+        self.__key_queue = []
+        self.__held = {}
+        self.__quit = False
         #Mouse details
         self.mouse_x = 0
         self.mouse_y = 0
         self.mouse_down = False
         self.mouse_held = False
+        #Mouse wheel steps this frame, positive when scrolled up (away from the user)
+        self.wheel = 0
+        self.__wheel = 0
+        #If dirty_rects is on, only the parts of the window that have changed are redrawn each frame
+        self.dirty_rects = dirty_rects
+        #Appearance and area of each shape when last drawn in dirty_rects mode, None if the last frame was fully redrawn
+        self.__states = None
+        self.__background = None
+        #Set when the window has been uncovered or restored, as whatever covered it may have left garbage behind
+        self.__exposed = False
+        #Shapes and groups this window draws, in layers
+        self.scene = scene()
+        #If culling is on, shapes entirely outside the viewport (x1, y1, x2, y2), or the window if it is None, are neither updated nor drawn
+        self.culling = culling
+        self.viewport = None
+        #Number of shapes culled in the last frame
+        self.culled = 0
+        #Paces update() to fps frames per second (or as fast as possible if False), and keeps frame time statistics
+        self.clock = clock(fps)
+        #False to draw on the window's surface, True to draw with a (GPU if available) SDL renderer, or "software" for SDL's software renderer
+        self.renderer = renderer
+        #Headless windows are never shown, but can be saved or read as images each frame
+        self.headless = headless
+        self.backend = None
+        #Seconds since the previous frame
+        self.delta = 0
+        #Images are stretched from their last size, rather than scaled again for every size, until the window has kept the same size for resize_delay seconds
+        self.resize_delay = 0.2
+        self.resizing = False
+        self.__resized_at = None
+        #Size from the latest resize event, applied at the start of the next update
+        self.__new_size = None
+        #Set to a profiler to time each part of update()
+        self.profiler = profiler() if profile else None
+        #Recorder saving every frame drawn, while the window is being recorded
+        self.recorder = None
+        load_key_names()
         self.start()
 
+    #The last frame drawn, as a NumPy array of RGB values with shape (height, width, 3)
+    def frame(self):
+        need_numpy()
+        data, mode, pitch = self.backend.read()
+        pixels = numpy.frombuffer(data,dtype=numpy.uint8).reshape(self.height,pitch)[:,:self.width*4].reshape(self.height,self.width,4)
+        if mode == "BGRX":
+            return(pixels[:,:,2::-1].copy())
+        return(pixels[:,:,:3].copy())
+
+    #Start recording every frame drawn, as numbered PNG files in the folder path or as raw RGB frames in the file path, with up to buffer frames waiting to be written before frames are dropped
+    def record(self, path, format="png", buffer=30):
+        if self.recorder is not None:
+            self.recorder.stop()
+        self.recorder = recorder(path,format,buffer)
+        return(self.recorder)
+
+    #Save the last frame drawn as an image, such as a PNG
+    def save(self, path):
+        data, mode, pitch = self.backend.read()
+        Image.frombuffer("RGB",(self.width,self.height),data,"raw",mode,pitch,1).save(path)
+
+    #Coordinates depend on the origin, so changing it clears the coordinates already worked out
+    @property
+    def origin(self):
+        return(self.__origin)
+
+    @origin.setter
+    def origin(self, origin):
+        self.__origin = origin
+        self.clear_layout()
+
+    #Forget px values worked out for the old window size or origin
+    def clear_layout(self):
+        self.coord_cache.clear()
+        self.width_cache.clear()
+        self.height_cache.clear()
+
+    #Change the size of the window from the program, which takes effect at the next update
+    def resize(self, width, height):
+        if self.__window is not None:
+            sdl2.SDL_SetWindowSize(self.__window.window,width,height)
+        self.__new_size = (width,height)
+
+    #Use a new size, only getting the new window surface and forgetting px values worked out for the old size
+    def __apply_size(self, width, height):
+        self.width = width
+        self.height = height
+        self.clear_layout()
+        self.backend.resize(width,height)
+        if not self.renderer:
+            self.surface = self.backend.surface
+        self.__resized_at = time.perf_counter()
+
     #Loop through events to check if window close button has been pressed
     def running(self):
-        running = True
-        events = sdl2.ext.get_events()
-        for event in events:
+        self.__read_events()
+        return(not self.__quit)
+
+    #Handle waiting events, queueing keyboard input to be read at the end of the next update
+    def __read_events(self):
+        for event in sdl2.ext.get_events():
             if event.type == sdl2.SDL_QUIT:
-                running = False
-                break
-        return(running)
+                self.__quit = True
+            elif event.type == sdl2.SDL_KEYDOWN:
+                self.__key_queue.append(("repeat" if event.key.repeat else "down",event.key.keysym.scancode))
+            elif event.type == sdl2.SDL_KEYUP:
+                self.__key_queue.append(("up",event.key.keysym.scancode))
+            elif event.type == sdl2.SDL_TEXTINPUT:
+                self.__key_queue.append(("text",event.text.text.decode("utf-8")))
+            elif event.type == sdl2.SDL_WINDOWEVENT and event.window.event == sdl2.SDL_WINDOWEVENT_SIZE_CHANGED:
+                self.__new_size = (event.window.data1,event.window.data2)
+            elif event.type == sdl2.SDL_WINDOWEVENT and event.window.event in [sdl2.SDL_WINDOWEVENT_EXPOSED,sdl2.SDL_WINDOWEVENT_RESTORED]:
+                self.__exposed = True
+            elif event.type == sdl2.SDL_MOUSEWHEEL:
+                if event.wheel.direction == sdl2.SDL_MOUSEWHEEL_FLIPPED:
+                    self.__wheel -= event.wheel.y
+                else:
+                    self.__wheel += event.wheel.y
+
+    #Turn the keyboard events queued since the last update into this frame's key lists
+    def __read_keys(self):
+        queue = self.__key_queue
+        self.__key_queue = []
+        self.key_events = []
+        self.key_changes = []
+        self.comm_changes = []
+        for kind, code in queue:
+            if kind == "text":
+                self.key_events.append((kind,code))
+                continue
+            key = key_names.get(code)
+            comm = comm_names.get(code)
+            if key is None and comm is None:
+                continue
+            if kind == "down":
+                self.__held[code] = None
+            elif kind == "up":
+                self.__held.pop(code,None)
+            if key is not None:
+                if self.caps or sdl2.SDL_SCANCODE_LSHIFT in self.__held or sdl2.SDL_SCANCODE_RSHIFT in self.__held:
+                    key = uppercase[key]
+                self.key_events.append((kind,key))
+                #A key pressed more than once in a frame is only listed once, in the order keys were first pressed
+                if kind == "down" and key not in self.key_changes:
+                    self.key_changes.append(key)
+            else:
+                self.key_events.append((kind,comm))
+                if kind == "down" and comm not in self.comm_changes:
+                    self.comm_changes.append(comm)
+                    #Toggle 'caps' flag
+                    if comm == "CAPS":
+                        self.caps = not self.caps
+        if queue:
+            self.keys, self.comms = held_keys(self.__held, self.caps)
     
     #Update window
     def update(self):
+        profiler = self.profiler
+        if profiler:
+            profiler.begin()
+
         #Retrieve python-friendly data for mouse position
         x, y = ctypes.c_int(0), ctypes.c_int(0)
         buttonstate = sdl2.mouse.SDL_GetMouseState(ctypes.byref(x), ctypes.byref(y))
@@ -93,40 +294,685 @@ class window:
             self.mouse_held = True
         else:
             self.mouse_held = False
+        if profiler:
+            profiler.lap("mouse")
     
-        #Fill screen with background colour
-        size = self.__window.size
-        sdl2.ext.fill(self.surface,self.colour)
-        self.position = self.__window.position
-
-        #Check if window needs to be resized
-        if size != (self.width, self.height):
-            self.width = size[0]
-            self.height = size[1]
-            self.__window.show()
-            self.start()
+        #Apply the latest size the window was changed to, keeping the same SDL window
+        if not self.headless:
+            self.position = self.__window.position
+        resized = self.__new_size is not None and self.__new_size != (self.width, self.height)
+        if resized:
+            self.__apply_size(*self.__new_size)
+            if profiler:
+                profiler.lap("resize")
+        self.__new_size = None
+        self.resizing = self.__resized_at is not None and time.perf_counter() - self.__resized_at < self.resize_delay
         
-        #Blit all visible shapes to screen
-        for shape in all_shapes:
-            if shape.visible:
+        #Swap in any images that have finished loading in the background
+        if loading:
+            finish_loading()
+
+        #Only the window surface keeps its contents between frames, so renderers always redraw everything
+        if self.dirty_rects and self.backend.retained:
+            #A window that has been uncovered or restored is redrawn and pushed whole, even if nothing in it has changed
+            self.__draw_dirty(resized or self.__exposed)
+            self.__exposed = False
+            if self.recorder is not None:
+                self.recorder.capture(self)
+        else:
+            self.__states = None
+            self.__exposed = False
+
+            #Fill screen with background colour
+            self.backend.clear(self.colour)
+            if profiler:
+                profiler.lap("fill")
+
+            #Blit all visible shapes to screen
+            for shape in self.__shown_shapes():
                 shape.display()
-        
-        #Push changes to window
-        self.__window.refresh()
+                if profiler:
+                    profiler.lap(type(shape).__name__)
 
-        #Get key changes from function
-        new_keys, new_comms = keys(self.caps)
+            if profiler and profiler.overlay:
+                profiler.draw(self.backend)
+                profiler.lap("overlay")
 
-        #Adjust lists accordingly
-        self.key_changes = list(set(new_keys)-set(self.keys))
-        self.keys = new_keys
-        self.comm_changes = list(set(new_comms)-set(self.comms))
-        self.comms = new_comms
-        
-        #Toggle 'caps' flag
-        if "CAPS" in self.comm_changes:
-            self.caps = not self.caps
+            #Copy the frame for the recording before it is pushed, as renderers don't always keep it afterwards
+            if self.recorder is not None:
+                self.recorder.capture(self)
+            
+            #Push changes to window
+            self.backend.present()
+            if profiler:
+                profiler.lap("refresh")
+
+        #Read events that arrived since running() was called, then update the key lists from them
+        self.__read_events()
+        self.__read_keys()
+        self.wheel = self.__wheel
+        self.__wheel = 0
+        if profiler:
+            profiler.lap("keys")
+
+        #Wait until it is time for the next frame, then run any fixed time step callbacks
+        self.clock.tick()
+        self.delta = self.clock.delta
+        if profiler:
+            profiler.lap("wait")
+            profiler.end()
+
+    #Visible shapes in drawing order, leaving out any entirely outside the viewport if culling is on
+    def __shown_shapes(self):
+        shapes = [shape for shape in self.scene.drawn() if shape.visible]
+        self.culled = 0
+        if self.culling:
+            #Bounds come from each shape's cached coordinates and last size, so nothing is rendered or resized to test it
+            if self.viewport:
+                area = hitbox(self,*self.viewport)
+            else:
+                area = (0,0,self.width,self.height)
+            kept = [shape for shape in shapes if overlaps(shape.bounds(),area)]
+            self.culled = len(shapes) - len(kept)
+            counters["shapes culled"] += self.culled
+            shapes = kept
+        return(shapes)
+
+    #Update every shape, then repaint and push only the areas where shapes have changed, moved, appeared or disappeared
+    def __draw_dirty(self, redraw):
+        profiler = self.profiler
+        states = {}
+        dirty = []
+        previous = self.__states
+        if previous is None or self.__background != self.colour:
+            redraw = True
+            previous = {}
+        for shape in self.__shown_shapes():
+            shape.update()
+            state = (shape.snapshot(),shape.bounds())
+            states[shape] = state
+            old = previous.get(shape)
+            if old != state:
+                if old is not None:
+                    dirty.append(old[1])
+                dirty.append(state[1])
+            if profiler:
+                profiler.lap(type(shape).__name__)
+        #Shapes that were deleted, hidden or culled leave behind the area they were drawn on
+        for shape in previous:
+            if shape not in states:
+                dirty.append(previous[shape][1])
+        #Shapes that have been moved forward or back may now cover each other differently, so redraw everything
+        if not redraw and [shape for shape in previous if shape in states] != [shape for shape in states if shape in previous]:
+            redraw = True
+        self.__states = states
+        self.__background = self.colour
+        #The profiler overlay changes every frame
+        overlay = profiler and profiler.overlay
+        if overlay:
+            dirty.append(profiler.area)
+
+        if not redraw:
+            dirty = merge_rects(dirty,self.width,self.height)
+            #Once most of the window has changed it is quicker to redraw all of it
+            if sum((r[2]-r[0])*(r[3]-r[1]) for r in dirty) > self.width*self.height//2:
+                redraw = True
+        if profiler:
+            profiler.lap("dirty rects")
+
+        backend = self.backend
+        if redraw:
+            backend.clear(self.colour)
+            if profiler:
+                profiler.lap("fill")
+            for shape in states:
+                shape.draw()
+                if profiler:
+                    profiler.lap(type(shape).__name__)
+            if overlay:
+                profiler.draw(backend)
+                profiler.lap("overlay")
+            backend.present()
+            if profiler:
+                profiler.lap("refresh")
+        elif dirty:
+            rects = []
+            for area in dirty:
+                rect = sdl2.SDL_Rect(area[0],area[1],area[2]-area[0],area[3]-area[1])
+                rects.append(rect)
+                #Clip drawing to the dirty area, so shapes that overlap it don't draw over clean parts of the window
+                backend.clip(rect)
+                backend.fill(self.colour,(rect.x,rect.y,rect.w,rect.h))
+                if profiler:
+                    profiler.lap("fill")
+                for shape in states:
+                    if overlaps(states[shape][1],area):
+                        shape.draw()
+                        if profiler:
+                            profiler.lap(type(shape).__name__)
+            backend.clip(None)
+            if overlay:
+                #The overlay may have grown, so push its new area too
+                profiler.draw(backend)
+                area = profiler.area
+                rects.append(sdl2.SDL_Rect(area[0],area[1],area[2]-area[0],area[3]-area[1]))
+                profiler.lap("overlay")
+            backend.present(rects)
+            if profiler:
+                profiler.lap("refresh")
     
+#Records a window's frames to disk by copying each one into a ring of reusable buffers, which a background thread encodes and writes, so recording never makes the window wait
+class recorder:
+    def __init__(self, path, format="png", buffer=30):
+        #A folder of numbered PNG files, or one file of raw 24-bit RGB frames one after another
+        self.path = path
+        self.format = format
+        if format == "png":
+            os.makedirs(path,exist_ok=True)
+            self.__file = None
+        elif format == "raw":
+            self.__file = open(path,"wb")
+        else:
+            raise ValueError("Recordings must be in 'png' or 'raw' format.")
+        #Frames copied, frames written, and frames dropped because every buffer was still waiting to be written
+        self.frames = 0
+        self.written = 0
+        self.dropped = 0
+        #(width, height) of the frames, which is needed to play a raw recording back
+        self.size = None
+        self.recording = True
+        #Buffers are reused rather than allocated for each frame, and are handed between the window and the writer by index
+        self.__buffers = [bytearray() for index in range(buffer)]
+        self.__free = queue.Queue()
+        for index in range(buffer):
+            self.__free.put(index)
+        self.__waiting = queue.Queue()
+        self.__error = None
+        self.__writer = threading.Thread(target=self.__write_frames,name="PyGraphica recorder",daemon=True)
+        self.__writer.start()
+
+    #Copy the frame the window has just drawn into a free buffer, or drop it if there isn't one
+    def capture(self, window):
+        if self.__error is not None:
+            self.stop()
+        if not self.recording:
+            return
+        size = (window.width,window.height)
+        if self.size is None:
+            self.size = size
+        try:
+            index = self.__free.get_nowait()
+        except queue.Empty:
+            index = None
+        #Frames of a raw recording must all be the same size
+        if index is None or (self.__file is not None and size != self.size):
+            if index is not None:
+                self.__free.put(index)
+            self.dropped += 1
+            return
+        mode, pitch = window.backend.read_into(self.__buffers[index])
+        self.__waiting.put((index,self.frames + self.dropped,size,mode,pitch))
+        self.frames += 1
+
+    #Stop recording, waiting for the frames already copied to be written
+    def stop(self):
+        if self.recording:
+            self.recording = False
+            self.__waiting.put(None)
+            self.__writer.join()
+            if self.__file is not None:
+                self.__file.close()
+        if self.__error is not None:
+            error = self.__error
+            self.__error = None
+            raise error
+
+    #Encode and write frames as they arrive, on the writer thread
+    def __write_frames(self):
+        while True:
+            frame = self.__waiting.get()
+            if frame is None:
+                return
+            index, number, size, mode, pitch = frame
+            try:
+                if self.__error is None:
+                    img = Image.frombytes("RGB",size,self.__buffers[index],"raw",mode,pitch,1)
+                    if self.__file is None:
+                        #Light compression keeps the writer ahead of the window, at the cost of larger files
+                        img.save(os.path.join(self.path,"frame"+str(number).zfill(6)+".png"),compress_level=1)
+                    else:
+                        self.__file.write(img.tobytes())
+                    self.written += 1
+            except Exception as error:
+                #The error is raised on the main thread the next time a frame is captured
+                self.__error = error
+            self.__free.put(index)
+
+#Times each part of window.update() and counts expensive work (fonts created, text rendered, images loaded) each frame
+class profiler:
+    def __init__(self, overlay=False, font=fonts.Calibri):
+        #Whether to draw the last frame's timings in the top left of the window
+        self.overlay = overlay
+        self.font = font
+        self.frames = 0
+        #Seconds spent in each phase, and counts of work done, in the last frame
+        self.phases = {}
+        self.counts = {}
+        #The same, added up over every frame since profiling started
+        self.total_phases = {}
+        self.total_counts = {}
+        #Area (px) covered by the overlay when last drawn
+        self.area = (0,0,0,0)
+        self.__hooks = []
+        self.__phases = {}
+        self.__counts = {}
+        self.__time = 0
+
+    #Call function(profiler) at the end of every frame
+    def on_frame(self, function):
+        self.__hooks.append(function)
+
+    def begin(self):
+        self.__phases = {}
+        self.__counts = dict(counters)
+        self.__time = time.perf_counter()
+
+    #Add the time since the last lap to a phase
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.__phases[phase] = self.__phases.get(phase,0) + now - self.__time
+        self.__time = now
+
+    def end(self):
+        self.phases = self.__phases
+        self.counts = {name:counters[name]-self.__counts.get(name,0) for name in counters}
+        for phase, seconds in self.phases.items():
+            self.total_phases[phase] = self.total_phases.get(phase,0) + seconds
+        for name, count in self.counts.items():
+            self.total_counts[name] = self.total_counts.get(name,0) + count
+        self.frames += 1
+        for hook in self.__hooks:
+            hook(self)
+
+    #Average seconds per frame spent in each phase, and work done per frame
+    def stats(self):
+        frames = max(self.frames,1)
+        return({
+            "frames":self.frames,
+            "phases":{phase:seconds/frames for phase, seconds in self.total_phases.items()},
+            "counts":{name:count/frames for name, count in self.total_counts.items()},
+        })
+
+    #Draw the last frame's timings (ms) and counts onto the window
+    def draw(self, backend):
+        lines = [phase+": "+format(seconds*1000,".2f")+"ms" for phase, seconds in self.phases.items()]
+        lines += [name+": "+str(count) for name, count in self.counts.items() if count]
+        font = get_font(self.font,14,colours.WHITE)
+        rendered = [font.render_text(line) for line in lines]
+        width = max([r.w for r in rendered]+[1]) + 8
+        height = sum(r.h for r in rendered) + 8
+        backend.fill(colours.BLACK,(0,0,width,height))
+        y = 4
+        for r in rendered:
+            backend.blit(r,4,y)
+            y += r.h
+            free_surface(r)
+        self.area = (0,0,width,height)
+
+#Shared by the drawing backends: fills and lines of the same colour are queued and drawn together in as few SDL calls as possible, keeping the order things were drawn in
+class backend:
+    def __init__(self):
+        self.__colour = None
+        #Queued (x, y, w, h) fills and (x1, y1, x2, y2) diagonal lines, all in self.__colour
+        self.__rects = []
+        self.__segments = []
+
+    #Start queuing in a new colour, drawing anything queued in the old one first
+    def __use(self, colour):
+        if colour != self.__colour:
+            self.flush()
+            self.__colour = colour
+
+    #Fill an (x, y, w, h) area
+    def fill(self, colour, area):
+        self.__use(colour)
+        self.__rects.append(area)
+
+    #Lines are drawn to match sdl2.ext.line on a surface
+    def line(self, colour, x1, y1, x2, y2, width=1):
+        if x1 == x2:
+            self.fill(colour,(x1-width//2,min(y1,y2),width,abs(y2-y1)))
+        elif y1 == y2:
+            self.fill(colour,(min(x1,x2),y1-width//2,abs(x2-x1),width))
+        elif width != 1:
+            raise ValueError("Diagonal lines must have a width of 1.")
+        else:
+            self.__use(colour)
+            self.__segments.append((x1,y1,x2,y2))
+
+    #Fill an (n, 4) array of (x, y, w, h) areas in px at once
+    def fills(self, colour, rects):
+        self.flush()
+        if len(rects):
+            self.fill_rects(colour,rects)
+
+    #Draw an (n, 4) array of (x1, y1, x2, y2) lines in px at once
+    def lines(self, colour, segments, width=1):
+        self.flush()
+        segments = numpy.asarray(segments,dtype=numpy.int32).reshape(-1,4)
+        x1, y1, x2, y2 = segments.T
+        vertical = x1 == x2
+        horizontal = (y1 == y2) & ~vertical
+        diagonal = segments[~(vertical | horizontal)]
+        if len(diagonal) and width != 1:
+            raise ValueError("Diagonal lines must have a width of 1.")
+        widths = numpy.full(len(segments),width,dtype=numpy.int32)
+        rects = numpy.concatenate((
+            numpy.column_stack((x1-width//2,numpy.minimum(y1,y2),widths,abs(y2-y1)))[vertical],
+            numpy.column_stack((numpy.minimum(x1,x2),y1-width//2,abs(x2-x1),widths))[horizontal],
+        ))
+        if len(rects):
+            self.fill_rects(colour,rects)
+        if len(diagonal):
+            self.draw_points(colour,line_points(diagonal))
+
+    #Draw everything queued
+    def flush(self):
+        if self.__rects:
+            self.fill_rects(self.__colour,self.__rects)
+            self.__rects = []
+        if self.__segments:
+            if not has_numpy:
+                for segment in self.__segments:
+                    self.draw_line(self.__colour,*segment)
+            else:
+                self.draw_points(self.__colour,line_points(numpy.array(self.__segments,dtype=numpy.int32)))
+            self.__segments = []
+
+#Draws straight onto a window's surface, which keeps its contents between frames
+class surface_backend(backend):
+    def __init__(self, window):
+        backend.__init__(self)
+        self.retained = True
+        self.__window = window
+        self.surface = window.get_surface()
+
+    def clear(self, colour):
+        self.flush()
+        sdl2.ext.fill(self.surface,colour)
+
+    #The window's surface is replaced when it changes size
+    def resize(self, width, height):
+        self.flush()
+        self.surface = self.__window.get_surface()
+
+    #Fill a list or array of (x, y, w, h) areas in one call
+    def fill_rects(self, colour, rects):
+        sdl2.SDL_FillRects(self.surface,rect_array(rects),len(rects),sdl2.ext.prepare_color(colour,self.surface))
+
+    #Colour an (n, 2) array of (x, y) pixels, skipping any outside the clip area
+    def draw_points(self, colour, points):
+        clip = self.surface.clip_rect
+        x, y = points.T
+        points = points[(x >= clip.x) & (x < clip.x + clip.w) & (y >= clip.y) & (y < clip.y + clip.h)]
+        if self.surface.format.contents.BytesPerPixel != 4:
+            ones = numpy.ones(len(points),dtype=numpy.int32)
+            self.fill_rects(colour,numpy.column_stack((points,ones,ones)))
+            return
+        pixels = numpy.ctypeslib.as_array(ctypes.cast(self.surface.pixels,ctypes.POINTER(ctypes.c_uint32)),(self.surface.h,self.surface.pitch//4))
+        pixels[points[:,1],points[:,0]] = sdl2.ext.prepare_color(colour,self.surface)
+
+    def draw_line(self, colour, x1, y1, x2, y2):
+        draw_line(self.surface,colour,x1,y1,x2,y2)
+
+    #Copy a surface, or only its (x, y, w, h) area, with its top left corner at (x, y)
+    def blit(self, surface, x, y, area=None):
+        self.flush()
+        if area is None:
+            sdl2.SDL_BlitSurface(surface,None,self.surface,sdl2.SDL_Rect(x,y,surface.w,surface.h))
+        else:
+            sdl2.SDL_BlitSurface(surface,sdl2.SDL_Rect(*area),self.surface,sdl2.SDL_Rect(x,y,area[2],area[3]))
+
+    #Copy a surface, or only its (x, y, w, h) area, scaled to w by h px with its top left corner at (x, y)
+    def stretch(self, surface, x, y, w, h, area=None):
+        self.flush()
+        sdl2.SDL_BlitScaled(surface,area and sdl2.SDL_Rect(*area),self.surface,sdl2.SDL_Rect(x,y,w,h))
+
+    #Limit drawing to an SDL_Rect, or None for the whole window
+    def clip(self, rect):
+        self.flush()
+        sdl2.SDL_SetClipRect(self.surface,rect)
+
+    #Copy of the pixels drawn, as (bytes, PIL raw mode, bytes per row)
+    def read(self):
+        self.flush()
+        return(surface_bytes(self.surface))
+
+    #Copy the pixels drawn into a bytearray, growing it if it is too small, and return (PIL raw mode, bytes per row)
+    def read_into(self, buffer):
+        self.flush()
+        surface = self.surface
+        if surface.format.contents.format in [sdl2.SDL_PIXELFORMAT_RGB888,sdl2.SDL_PIXELFORMAT_ARGB8888] and sys.byteorder == "little":
+            size = surface.pitch*surface.h
+            grow(buffer,size)
+            ctypes.memmove((ctypes.c_char*size).from_buffer(buffer),surface.pixels,size)
+            return(("BGRX",surface.pitch))
+        data, mode, pitch = surface_bytes(surface)
+        grow(buffer,len(data))
+        buffer[:len(data)] = data
+        return((mode,pitch))
+
+    #Push the whole window, or only a list of SDL_Rects, to the screen
+    def present(self, rects=None):
+        self.flush()
+        if rects is None:
+            self.__window.refresh()
+        else:
+            sdl2.SDL_UpdateWindowSurfaceRects(self.__window.window,(sdl2.SDL_Rect*len(rects))(*rects),len(rects))
+
+    def close(self):
+        pass
+
+#Draws onto a surface in memory, so frames can be rendered without a display
+class offscreen_backend(surface_backend):
+    def __init__(self, width, height):
+        backend.__init__(self)
+        self.retained = True
+        self.surface = sdl2.SDL_CreateRGBSurfaceWithFormat(0,width,height,32,sdl2.SDL_PIXELFORMAT_RGB888).contents
+
+    #There is no screen to push to
+    def present(self, rects=None):
+        self.flush()
+
+    def resize(self, width, height):
+        self.flush()
+        sdl2.SDL_FreeSurface(self.surface)
+        self.surface = sdl2.SDL_CreateRGBSurfaceWithFormat(0,width,height,32,sdl2.SDL_PIXELFORMAT_RGB888).contents
+
+    def close(self):
+        sdl2.SDL_FreeSurface(self.surface)
+
+#Draws with an SDL renderer, uploading text and images as textures the first time they are drawn
+class renderer_backend(backend):
+    def __init__(self, window, software=False):
+        backend.__init__(self)
+        self.retained = False
+        if software:
+            self.renderer = sdl2.SDL_CreateRenderer(window.window,-1,sdl2.SDL_RENDERER_SOFTWARE)
+        else:
+            #Machines without a GPU fall back to the software renderer
+            self.renderer = sdl2.SDL_CreateRenderer(window.window,-1,sdl2.SDL_RENDERER_ACCELERATED) or sdl2.SDL_CreateRenderer(window.window,-1,sdl2.SDL_RENDERER_SOFTWARE)
+        if not self.renderer:
+            raise sdl2.ext.SDLError()
+        #Textures by the address of the surface they were made from
+        self.__textures = {}
+        renderers.append(self)
+
+    def __colour(self, colour):
+        colour = sdl2.ext.convert_to_color(colour)
+        sdl2.SDL_SetRenderDrawColor(self.renderer,colour.r,colour.g,colour.b,colour.a)
+
+    def clear(self, colour):
+        self.flush()
+        self.__colour(colour)
+        sdl2.SDL_RenderClear(self.renderer)
+
+    #Fill a list or array of (x, y, w, h) areas in one call
+    def fill_rects(self, colour, rects):
+        self.__colour(colour)
+        sdl2.SDL_RenderFillRects(self.renderer,rect_array(rects),len(rects))
+
+    #Colour an (n, 2) array of (x, y) pixels
+    def draw_points(self, colour, points):
+        self.__colour(colour)
+        points = numpy.ascontiguousarray(points,dtype=numpy.int32)
+        sdl2.SDL_RenderDrawPoints(self.renderer,points.ctypes.data_as(ctypes.POINTER(sdl2.SDL_Point)),len(points))
+
+    def draw_line(self, colour, x1, y1, x2, y2):
+        self.__colour(colour)
+        sdl2.SDL_RenderDrawLine(self.renderer,x1,y1,x2,y2)
+
+    #Texture made from a surface, uploading it the first time it is drawn
+    def __texture(self, surface):
+        texture = self.__textures.get(ctypes.addressof(surface))
+        if texture is None:
+            texture = sdl2.SDL_CreateTextureFromSurface(self.renderer,surface)
+            self.__textures[ctypes.addressof(surface)] = texture
+        return(texture)
+
+    #Copy a surface, or only its (x, y, w, h) area, with its top left corner at (x, y)
+    def blit(self, surface, x, y, area=None):
+        self.flush()
+        texture = self.__texture(surface)
+        if area is None:
+            sdl2.SDL_RenderCopy(self.renderer,texture,None,sdl2.SDL_Rect(x,y,surface.w,surface.h))
+        else:
+            sdl2.SDL_RenderCopy(self.renderer,texture,sdl2.SDL_Rect(*area),sdl2.SDL_Rect(x,y,area[2],area[3]))
+
+    #Copy a surface, or only its (x, y, w, h) area, scaled to w by h px with its top left corner at (x, y)
+    def stretch(self, surface, x, y, w, h, area=None):
+        self.flush()
+        sdl2.SDL_RenderCopy(self.renderer,self.__texture(surface),area and sdl2.SDL_Rect(*area),sdl2.SDL_Rect(x,y,w,h))
+
+    #Limit drawing to an SDL_Rect, or None for the whole window
+    def clip(self, rect):
+        self.flush()
+        sdl2.SDL_RenderSetClipRect(self.renderer,rect)
+
+    #SDL resizes the renderer's output along with its window
+    def resize(self, width, height):
+        self.flush()
+
+    def present(self, rects=None):
+        self.flush()
+        sdl2.SDL_RenderPresent(self.renderer)
+
+    #Copy of the pixels drawn, as (bytes, PIL raw mode, bytes per row)
+    def read(self):
+        self.flush()
+        width, height = ctypes.c_int(0), ctypes.c_int(0)
+        sdl2.SDL_GetRendererOutputSize(self.renderer,ctypes.byref(width),ctypes.byref(height))
+        pixels = ctypes.create_string_buffer(width.value*height.value*4)
+        sdl2.SDL_RenderReadPixels(self.renderer,None,sdl2.SDL_PIXELFORMAT_RGBA32,pixels,width.value*4)
+        return((pixels.raw,"RGBX",width.value*4))
+
+    #Copy the pixels drawn into a bytearray, growing it if it is too small, and return (PIL raw mode, bytes per row)
+    def read_into(self, buffer):
+        self.flush()
+        width, height = ctypes.c_int(0), ctypes.c_int(0)
+        sdl2.SDL_GetRendererOutputSize(self.renderer,ctypes.byref(width),ctypes.byref(height))
+        size = width.value*height.value*4
+        grow(buffer,size)
+        sdl2.SDL_RenderReadPixels(self.renderer,None,sdl2.SDL_PIXELFORMAT_RGBA32,(ctypes.c_char*size).from_buffer(buffer),width.value*4)
+        return(("RGBX",width.value*4))
+
+    #Destroy the texture made from a surface that is being freed
+    def forget(self, surface):
+        texture = self.__textures.pop(ctypes.addressof(surface),None)
+        if texture is not None:
+            sdl2.SDL_DestroyTexture(texture)
+
+    def close(self):
+        for texture in self.__textures.values():
+            sdl2.SDL_DestroyTexture(texture)
+        self.__textures = {}
+        sdl2.SDL_DestroyRenderer(self.renderer)
+        renderers.remove(self)
+
+#Frame pacing and timing for a window
+class clock:
+    def __init__(self, fps=False, history=120):
+        #Target frames per second, or False to run as fast as possible
+        self.fps = fps
+        #Seconds between the last two frames
+        self.delta = 0
+        self.frames = 0
+        #Frames missed because a frame took longer than 1/fps
+        self.dropped = 0
+        #Frame times, and the part of each frame spent working rather than waiting, for the most recent frames
+        self.__times = collections.deque(maxlen=history)
+        self.__busy = collections.deque(maxlen=history)
+        #Fixed time step callbacks, as [function, step, time not yet stepped through]
+        self.__callbacks = []
+        self.__last = time.perf_counter()
+        self.__deadline = self.__last
+
+    #Call function(step) every step seconds of game time, independently of the frame rate
+    def every(self, step, function):
+        self.__callbacks.append([function,step,0])
+
+    def cancel(self, function):
+        self.__callbacks = [callback for callback in self.__callbacks if callback[0] != function]
+
+    #Mark the end of a frame, sleeping first if the frame finished early
+    def tick(self):
+        now = time.perf_counter()
+        if self.frames == 0:
+            #Start timing from the first frame rather than from when the window was made
+            self.__last = self.__deadline = now
+        self.__busy.append(now - self.__last)
+        if self.fps:
+            period = 1/self.fps
+            self.__deadline += period
+            if now < self.__deadline:
+                time.sleep(self.__deadline - now)
+                now = time.perf_counter()
+            else:
+                #Frame was late, so count the frames it missed and start timing again from now rather than rushing to catch up
+                self.dropped += int((now - self.__deadline) / period)
+                self.__deadline = now
+        self.delta = now - self.__last
+        self.__last = now
+        self.__times.append(self.delta)
+        self.frames += 1
+
+        for callback in self.__callbacks:
+            callback[2] += self.delta
+            #Limit catching up after a long pause, so a slow callback can't stall the window
+            steps = 0
+            while callback[2] >= callback[1] and steps < 8:
+                callback[0](callback[1])
+                callback[2] -= callback[1]
+                steps += 1
+            if steps == 8:
+                callback[2] = 0
+
+    #Frame time statistics (in seconds) over the most recent frames
+    def stats(self):
+        times = sorted(self.__times)
+        if not times:
+            return({"fps":0,"mean":0,"p95":0,"p99":0,"max":0,"busy":0,"dropped":self.dropped})
+        mean = sum(times)/len(times)
+        return({
+            "fps":1/mean if mean else 0,
+            "mean":mean,
+            "p95":times[int(0.95*(len(times)-1))],
+            "p99":times[int(0.99*(len(times)-1))],
+            "max":times[-1],
+            "busy":sum(self.__busy)/len(self.__busy),
+            "dropped":self.dropped,
+        })
+
 class line:
     def __init__(self,window,x1,y1,x2,y2,colour):
         self.__window = window
@@ -139,14 +985,102 @@ class line:
         #Flag for whether line should be displayed or not
         self.visible = True
         #Add self to list of items to be displayed
-        all_shapes.append(self)
+        self.__window.scene.add(self)
     
     def display(self):
+        self.update()
+        self.draw()
+
+    #Lines can't be hovered over or clicked, so there is nothing to update
+    def update(self):
+        pass
+
+    def draw(self):
         #Adjust coordinates from user form to computer form
         start = make_pos(self.__window,(self.x1,self.y1))
         end = make_pos(self.__window,(self.x2,self.y2))
         #Display line
-        sdl2.ext.line(self.__window.surface,self.colour,(start[0],start[1],end[0],end[1]))
+        self.__window.backend.line(self.colour,start[0],start[1],end[0],end[1])
+
+    #Move the line by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+        self.x2 = shift(self.x2,dx,self.__window.width)
+        self.y2 = shift(self.y2,dy,self.__window.height)
+
+    #Area of the screen (px) that the line is drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        end = make_pos(self.__window,(self.x2,self.y2))
+        xmin,xmax = sorted((start[0],end[0]))
+        ymin,ymax = sorted((start[1],end[1]))
+        return((xmin,ymin,xmax+1,ymax+1))
+
+    #Everything other than position that affects how the line looks
+    def snapshot(self):
+        return((self.colour,))
+
+#Many lines drawn as one object, from an (n, 2) array of points joined one after another or an (n, 4) array of separate (x1, y1, x2, y2) lines
+class lines:
+    def __init__(self,window,points,colour,relative=False):
+        need_numpy()
+        self.__window = window
+        #Coordinates in the window's origin system, in px, or in % of the window if relative is True
+        self.points = points
+        self.relative = relative
+        self.colour = colour
+        #Flag for whether the lines should be displayed or not
+        self.visible = True
+        self.update()
+        #Add self to list of items to be displayed
+        self.__window.scene.add(self)
+
+    def display(self):
+        self.update()
+        self.draw()
+
+    #Keep (x1,y1) and (x2,y2) at the corners around every point, so collision() works on the whole shape
+    def update(self):
+        points = numpy.asarray(self.points)
+        if len(points) == 0:
+            self.x1 = self.y1 = self.x2 = self.y2 = 0
+            return
+        corners = (points[:,0::2].min(),points[:,1::2].min(),points[:,0::2].max(),points[:,1::2].max())
+        if self.relative:
+            self.x1,self.y1,self.x2,self.y2 = [str(corner) for corner in corners]
+        else:
+            self.x1,self.y1,self.x2,self.y2 = [corner.item() for corner in corners]
+
+    #Every line in px based on a top-left origin, as an (n, 4) array of (x1, y1, x2, y2)
+    def segments(self):
+        points = numpy.asarray(self.points)
+        if points.shape[1] == 2:
+            points = numpy.column_stack((points[:-1],points[1:]))
+        x,y = resolve_points(self.__window,points[:,0::2],points[:,1::2],self.relative)
+        return(numpy.column_stack((x[:,0],y[:,0],x[:,1],y[:,1])).astype(numpy.int64))
+
+    def draw(self):
+        self.__window.backend.lines(self.colour,self.segments())
+
+    #Move the lines by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        if self.relative:
+            dx, dy = dx * 100 / self.__window.width, dy * 100 / self.__window.height
+        points = numpy.asarray(self.points)
+        self.points = points + numpy.tile((dx,dy),points.shape[1]//2)
+
+    #Area of the screen (px) that the lines are drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        segments = self.segments()
+        if len(segments) == 0:
+            return((0,0,0,0))
+        x,y = segments[:,0::2],segments[:,1::2]
+        return((int(x.min()),int(y.min()),int(x.max())+1,int(y.max())+1))
+
+    #Everything other than the bounding corners that affects how the lines look
+    def snapshot(self):
+        return((self.colour,self.relative,numpy.asarray(self.points).tobytes()))
 
 class rect:
     def __init__(self,window,x1,y1,x2,y2,colour=False,border_colour=False,border_thickness=1):
@@ -162,9 +1096,14 @@ class rect:
         #Flags for hover and clicked are changed in update function
         self.hover = False
         self.clicked = False
-        all_shapes.append(self)
+        self.__window.scene.add(self)
     
     def display(self):
+        self.update()
+        self.draw()
+
+    #Update hover and clicked flags from the mouse
+    def update(self):
         start = make_pos(self.__window,(self.x1,self.y1))
         end = make_pos(self.__window,(self.x2,self.y2))
 
@@ -178,6 +1117,18 @@ class rect:
         else:
             self.hover = False
 
+        #If the mouse is newly clicked, if the object is hovered on toggle clicked, otherwise it is not clicked
+        if not self.__window.mouse_held and self.__window.mouse_down:
+            if self.hover and not self.clicked:
+                self.clicked = True
+            else:
+                self.clicked = False
+
+    def draw(self):
+        backend = self.__window.backend
+        start = make_pos(self.__window,(self.x1,self.y1))
+        end = make_pos(self.__window,(self.x2,self.y2))
+
         #If the rectangle is filled in, fill in the corresponding area
         if self.colour:
             w = end[0] - start[0]
@@ -192,24 +1143,123 @@ class rect:
                 h = h * -1
             else:
                 y = start[1]
-            sdl2.ext.draw.fill(self.__window.surface,self.colour,(x,y,w,h))
+            backend.fill(self.colour,(x,y,w,h))
         
         #If rectangle has a border, create the four lines of the border
         if self.border_colour:
-            sdl2.ext.line(self.__window.surface,self.border_colour,(start[0],start[1],start[0],end[1]),self.border_thickness)
-            sdl2.ext.line(self.__window.surface,self.border_colour,(end[0],start[1],end[0],end[1]),self.border_thickness)
-            sdl2.ext.line(self.__window.surface,self.border_colour,(start[0],start[1],end[0],start[1]),self.border_thickness)
-            sdl2.ext.line(self.__window.surface,self.border_colour,(start[0],end[1],end[0],end[1]),self.border_thickness)
+            backend.line(self.border_colour,start[0],start[1],start[0],end[1],self.border_thickness)
+            backend.line(self.border_colour,end[0],start[1],end[0],end[1],self.border_thickness)
+            backend.line(self.border_colour,start[0],start[1],end[0],start[1],self.border_thickness)
+            backend.line(self.border_colour,start[0],end[1],end[0],end[1],self.border_thickness)
+
+    #Move the rectangle by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+        self.x2 = shift(self.x2,dx,self.__window.width)
+        self.y2 = shift(self.y2,dy,self.__window.height)
+
+    #Area of the screen (px) that the rectangle is drawn on, including its border, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        end = make_pos(self.__window,(self.x2,self.y2))
+        xmin,xmax = sorted((start[0],end[0]))
+        ymin,ymax = sorted((start[1],end[1]))
+        if self.border_colour:
+            pad = self.border_thickness//2 + 1
+            return((xmin-pad,ymin-pad,xmax+pad,ymax+pad))
+        return((xmin,ymin,xmax,ymax))
+
+    #Everything other than position that affects how the rectangle looks
+    def snapshot(self):
+        return((self.colour,self.border_colour,self.border_thickness))
+
+#Many filled rectangles kept in NumPy arrays and drawn as one object, for particles and large simulations
+class rect_batch:
+    def __init__(self,window,n,colour=colours.WHITE,relative=False):
+        need_numpy()
+        self.__window = window
+        #Corner of each rectangle in the window's origin system, and its size, so it reaches (x + width, y + height) like x2 and y2 of a rect
+        self.x = numpy.zeros(n)
+        self.y = numpy.zeros(n)
+        self.width = numpy.zeros(n)
+        self.height = numpy.zeros(n)
+        #Whether the arrays above are in % of the window rather than px
+        self.relative = relative
+        #RGB colour of each rectangle
+        self.colour = numpy.empty((n,3),dtype=numpy.uint8)
+        self.colour[:] = colour[:3]
+        #Which rectangles are drawn
+        self.shown = numpy.ones(n,dtype=bool)
+        #Which rectangles the mouse is over, changed in update function
+        self.hover = numpy.zeros(n,dtype=bool)
+        #Flag for whether the whole batch should be displayed or not
+        self.visible = True
+        self.update()
+        self.__window.scene.add(self)
 
-        #If the mouse is newly clicked, if the object is hovered on toggle clicked, otherwise it is not clicked
-        if not self.__window.mouse_held and self.__window.mouse_down:
-            if self.hover and not self.clicked:
-                self.clicked = True
-            else:
-                self.clicked = False
+    def display(self):
+        self.update()
+        self.draw()
+
+    #Each rectangle in px based on a top-left origin, as an (n, 4) array of (x, y, w, h)
+    def areas(self):
+        if self.relative:
+            x1,y1 = resolve_points(self.__window,self.x,self.y,True)
+            x2,y2 = resolve_points(self.__window,self.x + self.width,self.y + self.height,True)
+        else:
+            x1,y1 = resolve_points(self.__window,self.x.astype(numpy.int64),self.y.astype(numpy.int64))
+            x2,y2 = resolve_points(self.__window,(self.x + self.width).astype(numpy.int64),(self.y + self.height).astype(numpy.int64))
+        return(numpy.column_stack((numpy.minimum(x1,x2),numpy.minimum(y1,y2),abs(x2 - x1),abs(y2 - y1))))
+
+    #Update hover flags, and keep (x1,y1) and (x2,y2) at the corners around every shown rectangle so collision() works on the whole batch
+    def update(self):
+        areas = self.areas()
+        mouse_x, mouse_y = self.__window.mouse_x, self.__window.mouse_y
+        self.hover = self.shown & (areas[:,0] < mouse_x) & (mouse_x < areas[:,0] + areas[:,2]) & (areas[:,1] < mouse_y) & (mouse_y < areas[:,1] + areas[:,3])
+
+        if not self.shown.any():
+            self.x1 = self.y1 = self.x2 = self.y2 = 0
+            return
+        xs = numpy.concatenate((self.x[self.shown],(self.x + self.width)[self.shown]))
+        ys = numpy.concatenate((self.y[self.shown],(self.y + self.height)[self.shown]))
+        corners = (xs.min(),ys.min(),xs.max(),ys.max())
+        if self.relative:
+            self.x1,self.y1,self.x2,self.y2 = [str(corner) for corner in corners]
+        else:
+            self.x1,self.y1,self.x2,self.y2 = [int(corner) for corner in corners]
+
+    #Rectangles are drawn in order, filling each run of neighbouring rectangles with the same colour in one call, so keeping colours together is fastest
+    def draw(self):
+        areas = self.areas()[self.shown]
+        colour = self.colour[self.shown]
+        if len(areas) == 0:
+            return
+        starts = numpy.flatnonzero(numpy.concatenate(([True],(colour[1:] != colour[:-1]).any(axis=1))))
+        ends = numpy.append(starts[1:],len(areas))
+        for start, end in zip(starts,ends):
+            self.__window.backend.fills(tuple(colour[start].tolist()),areas[start:end])
+
+    #Move every rectangle by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        if self.relative:
+            dx, dy = dx * 100 / self.__window.width, dy * 100 / self.__window.height
+        self.x = self.x + dx
+        self.y = self.y + dy
+
+    #Area of the screen (px) that the shown rectangles are drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        areas = self.areas()[self.shown]
+        if len(areas) == 0:
+            return((0,0,0,0))
+        return((int(areas[:,0].min()),int(areas[:,1].min()),int((areas[:,0] + areas[:,2]).max()),int((areas[:,1] + areas[:,3]).max())))
+
+    #Everything that affects how the batch looks, as every rectangle can move inside the bounds
+    def snapshot(self):
+        return((self.relative,)+tuple(array.tobytes() for array in (self.x,self.y,self.width,self.height,self.colour,self.shown)))
 
 class text:
-    def __init__(self, window, x1, y1, size, colour, content, font = fonts.Calibri):
+    def __init__(self, window, x1, y1, size, colour, content, font = fonts.Calibri, glyphs = False):
         self.__window = window
         self.x1 = x1
         self.y1 = y1
@@ -222,71 +1272,35 @@ class text:
         self.hover = False
         self.clicked = False
         self.font = font
-        all_shapes.append(self)
-
-        start = make_pos(self.__window,(self.x1,self.y1))
-        size = make_height(self.__window,self.size)
-
-        #Create font object
-        font = sdl2.ext.ttf.FontTTF(self.font,str(str(size)+"px"),self.colour)
-
-        #Render content in font
-        textbox = font.render_text(self.content)
-
-        #Make area where text will go
-        rect = (start[0],start[1],start[0]+textbox.w,start[1]+textbox.h)
-        self.width = textbox.w
-        self.height = textbox.h
-
-        #Make function to get the endpoint of the text based on the position of the origin and the size of the text, important for making textboxes later on
-        if type(self.x1) == int and type(self.y1) == int and type(self.height) == int:
-            if self.__window.origin == 0:
-                self.__get_end = lambda obj:(obj.x1+obj.width,obj.y1+obj.height)
-            elif self.__window.origin == 1:
-                self.__get_end = lambda obj:(obj.x1-obj.width,obj.y1+obj.height)
-            elif self.__window.origin in [2,4]:
-                self.__get_end = lambda obj:(obj.x1+obj.width,obj.y1-obj.height)
-            elif self.__window.origin == 3:
-                self.__get_end = lambda obj:(obj.x1-obj.width,obj.y1-obj.height)
-        elif type(self.x1) == str and type(self.y1) == str:
-            if self.__window.origin == 0:
-                self.__get_end = lambda obj:(str(int(obj.x1)+int(rela_width(obj.__window,obj.width))),str(int(obj.y1)+int(rela_height(obj.__window,obj.height))))
-            elif self.__window.origin == 1:
-                self.__get_end = lambda obj:(str(int(obj.x1)-int(rela_width(obj.__window,obj.width))),str(int(obj.y1)+int(rela_height(obj.__window,obj.height))))
-            elif self.__window.origin in [2,4]:
-                self.__get_end = lambda obj:(str(int(obj.x1)+int(rela_width(obj.__window,obj.width))),str(int(obj.y1)-int(rela_height(obj.__window,obj.height))))
-            elif self.__window.origin == 3:
-                self.__get_end = lambda obj:(str(int(obj.x1)-int(rela_width(obj.__window,obj.width))),str(int(obj.y1)-int(rela_height(obj.__window,obj.height))))
-        else:
-            if self.__window.origin == 0:
-                def func(obj):
-                    x1,y1 = make_pos(obj.__window,(obj.x1,obj.y1))
-                    return((x1+make_width(obj.__window,obj.width),y1+make_height(obj.__window,obj.height)))
-            elif self.__window.origin == 1:
-                def func(obj):
-                    x1,y1 = make_pos(obj.__window,(obj.x1,obj.y1))
-                    return((x1-make_width(obj.__window,obj.width),y1+make_height(obj.__window,obj.height)))
-            elif self.__window.origin in [2,4]:
-                def func(obj):
-                    x1,y1 = make_pos(obj.__window,(obj.x1,obj.y1))
-                    return((x1+make_width(obj.__window,obj.width),y1-make_height(obj.__window,obj.height)))
-            elif self.__window.origin == 3:
-                def func(obj):
-                    x1,y1 = make_pos(obj.__window,(obj.x1,obj.y1))
-                    return((x1-make_width(obj.__window,obj.width),y1-make_height(obj.__window,obj.height)))
-            self.__get_end = func
-        
-        #Use function to define endpoint of text
-        end = self.__get_end(self)
-        self.x2 = end[0]
-        self.y2 = end[1]
+        #If glyphs is True, the text is drawn from glyphs rendered once each, which is faster for text that changes every frame
+        self.glyphs = glyphs
+        #Surface of the last render, and the properties it was rendered with
+        self.__surface = None
+        self.__key = None
+        #Glyph atlas, glyph positions and properties of the last layout if glyphs is True
+        self.__atlas = None
+        self.__layout = []
+        self.__glyph_key = None
+        self.__window.scene.add(self)
+
+        #Measure content to find the size of the text
+        self.__measure()
+
+        #Work out the endpoint of the text, important for making textboxes later on
+        self.__end_key = None
+        self.__get_end()
     
     def display(self):
-        #Get end in case things have changed
-        end = self.__get_end(self)
+        self.update()
+        self.draw()
+
+    #Update the size, endpoint, and hover and clicked flags of the text
+    def update(self):
+        #Measure the text, which only renders it if glyphs is on and there are new characters
+        self.__measure()
 
-        self.x2 = end[0]
-        self.y2 = end[1]
+        #Get end in case things have changed
+        self.__get_end()
 
         end = make_pos(self.__window,(self.x2,self.y2))
         start = make_pos(self.__window,(self.x1,self.y1))
@@ -307,14 +1321,86 @@ class text:
             else:
                 self.clicked = False
 
-        #Recreate text in case anything has changed
+    def draw(self):
+        #Empty text has a size but nothing to render
+        if not self.content:
+            return
+        textbox = self.__render()
+        start = make_pos(self.__window,(self.x1,self.y1))
+        if self.glyphs:
+            for area,x,y in self.__layout:
+                self.__window.backend.blit(textbox.surface,start[0]+x,start[1]+y,area)
+        else:
+            self.__window.backend.blit(textbox,start[0],start[1])
+
+    #Move the text by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+
+    #Area of the screen (px) that the text is drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        return((start[0],start[1],start[0]+self.width,start[1]+self.height))
+
+    #Everything other than position that affects how the text looks
+    def snapshot(self):
+        return((self.content,self.size,self.colour,self.font,self.glyphs))
+
+    #Set the endpoint of the text based on its start, its size and the position of the origin, only if any of them have changed
+    def __get_end(self):
+        origin = self.__window.origin
+        key = (self.x1,self.y1,self.width,self.height,self.__window.width,self.__window.height,origin)
+        if key == self.__end_key:
+            return
+        self.__end_key = key
+        x_dir = -1 if origin in [1,3] else 1
+        y_dir = -1 if origin in [2,3,4] else 1
+        if type(self.x1) == int and type(self.y1) == int:
+            self.x2 = self.x1 + x_dir*self.width
+            self.y2 = self.y1 + y_dir*self.height
+        elif type(self.x1) == str and type(self.y1) == str:
+            #Keep the endpoint relative if the start is relative
+            self.x2 = percent(float(self.x1) + x_dir*int(rela_width(self.__window,self.width)))
+            self.y2 = percent(float(self.y1) + y_dir*int(rela_height(self.__window,self.height)))
+        else:
+            x1,y1 = make_pos(self.__window,(self.x1,self.y1))
+            self.x2 = x1 + x_dir*self.width
+            self.y2 = y1 + y_dir*self.height
+
+    #Set the width and height of the text without rendering it
+    def __measure(self):
+        if self.glyphs:
+            self.__render()
+        else:
+            #Empty text is measured too, as no width and one line high
+            self.width, self.height = measure_text(self.font,make_height(self.__window,self.size),self.content)
+
+    #Return the rendered text, re-rendering only if the content, size, colour or font have changed since the last render
+    def __render(self):
         size = make_height(self.__window,self.size)
-        font = sdl2.ext.ttf.FontTTF(self.font,str(str(size)+"px"),self.colour)
-        textbox = font.render_text(self.content)
-        rect = (start[0],start[1],start[0]+textbox.w,start[1]+textbox.h)
-        self.width = textbox.w
-        self.height = textbox.h
-        sdl2.SDL_BlitSurface(textbox,None,self.__window.surface,sdl2.SDL_Rect(rect[0],rect[1],rect[2],rect[3]))
+        key = (self.content,size,tuple(self.colour),self.font)
+        if self.glyphs:
+            #Lay the glyphs out again if the text has changed, or its atlas was dropped from the cache and made again
+            atlas = get_glyphs(self.font,size,self.colour)
+            if key != self.__glyph_key or atlas is not self.__atlas:
+                self.__layout, self.width, self.height = atlas.layout(self.content)
+                self.__atlas = atlas
+                self.__glyph_key = key
+            return(atlas)
+        if shared_text:
+            surface = cached_text(self.font,size,self.colour,self.content)
+        else:
+            if key != self.__key:
+                if self.__surface is not None:
+                    free_surface(self.__surface)
+                self.__surface = get_font(self.font,size,self.colour).render_text(self.content)
+                counters["text rendered"] += 1
+                self.__key = key
+            surface = self.__surface
+        self.width = surface.w
+        self.height = surface.h
+        return(surface)
 
 #Text input field, where users can type things and programmers can easily extract them
 class textbox:
@@ -333,14 +1419,14 @@ class textbox:
         #Text object component of textbox
         self.__text = text(self.__window,self.x1,self.y1,self.size,(0,0,0),"Type here...",self.font)
         #The textbox will have its own display function, so the text component must be removed from the list of objects to display
-        all_shapes.remove(self.__text)
+        delete(self.__text)
 
         #create function to calculate the width of the textbox to the start of the text
         if type(self.__text.x1) == str:
             if self.__window.origin in [1,3]:
-                self.__add_width = lambda obj:(str(int(obj.__text.x1)-int(rela_width(obj.__window,obj.width))))
+                self.__add_width = lambda obj:(percent(float(obj.__text.x1)-int(rela_width(obj.__window,obj.width))))
             else:
-                self.__add_width = lambda obj:(str(int(obj.__text.x1)+int(rela_width(obj.__window,obj.width))))
+                self.__add_width = lambda obj:(percent(float(obj.__text.x1)+int(rela_width(obj.__window,obj.width))))
         else:
             if self.__window.origin in [1,3]:
                 self.__add_width = lambda obj:(obj.__text.x1-make_width(obj.__window,obj.width))
@@ -352,17 +1438,41 @@ class textbox:
 
         #Create box component of the textbox
         self.__box = rect(self.__window,self.x1,self.y1,self.x2,self.y2,(255,255,255),((0,0,0),1))
-        all_shapes.remove(self.__box)
+        delete(self.__box)
 
-        all_shapes.append(self)
+        self.__window.scene.add(self)
     
     def display(self):
+        self.update()
+        self.draw()
+
+    #Update the box and text components, and add any typed keys to the content
+    def update(self):
         #Redefine position of textbox
         self.__text.x1 = self.x1
         self.__text.y1 = self.y1
         self.__box.x1 = self.x1
         self.__box.y1 = self.y1
 
+        #Add content to textbox, in the order it was typed
+        if self.__box.clicked:
+            for kind, key in self.__window.key_events:
+                if kind == "text":
+                    self.content = self.content + key
+                elif kind != "up" and key == "BACKSPACE":
+                    self.content = self.content[:-1]
+
+        #If user has not typed anything, display default text in grey, otherwise display user's text
+        if self.content == "":
+            self.__text.content = " " + self.default_text
+            self.__text.colour = (100,100,100)
+        else:
+            self.__text.content = " " + self.content
+            self.__text.colour = (0,0,0)
+
+        #Measure the text as it is now, so the box fits what was typed this frame
+        self.__text.update()
+
         #If the text typed in to the textbox is larger than the defaul width of the textbox, stretch to fit it, otherwise use default width
         if make_width(self.__window,self.width) > make_width(self.__window,self.__text.width):
             self.__box.x2 = self.__add_width(self)
@@ -382,29 +1492,252 @@ class textbox:
             self.__box.border_thickness = 1
             self.__box.border_colour = (0,0,0)
 
-        #If user has not typed anything, display default text in grey, otherwise display user's text
-        if self.content == "":
-            self.__text.content = " " + self.default_text
-            self.__text.colour = (100,100,100)
-        else:
-            self.__text.content = " " + self.content
-            self.__text.colour = (0,0,0)
+        self.__box.update()
 
-        #Add content to textbox
-        if self.__box.clicked:
-            add = self.__window.key_changes
-            if "BACKSPACE" in self.__window.comm_changes and self.content != "":
-                self.content = self.content[:-1]
-            if len(add) > 0:
-                self.content = self.content + add[0]
+    def draw(self):
+        self.__box.draw()
+        self.__text.draw()
+
+    #Move the textbox by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+
+    #Area of the screen (px) that the textbox is drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        box = self.__box.bounds()
+        text = self.__text.bounds()
+        return((min(box[0],text[0]),min(box[1],text[1]),max(box[2],text[2]),max(box[3],text[3])))
+
+    #Everything other than position that affects how the textbox looks
+    def snapshot(self):
+        return((self.__box.snapshot(),self.__text.snapshot()))
+
+#Multi-line text field for long documents and logs, which keeps its text as a list of lines and only measures and renders the lines in view
+class textarea:
+    def __init__(self,window,x1,y1,x2,y2,size,font=fonts.Calibri,content="",colour=(0,0,0),background=(255,255,255)):
+        self.__window = window
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.size = size
+        self.font = font
+        self.colour = colour
+        self.background = background
+        self.visible = True
+        #Text of the textarea, one string per line
+        self.lines = content.split("\n")
+        #Index of the first line in view
+        self.scroll = 0
+        #Lines scrolled by each step of the mouse wheel
+        self.wheel_lines = 3
+        #Line and column the cursor is in front of
+        self.cursor_line = 0
+        self.cursor_column = 0
+        #Whether typing goes in to the textarea, set by clicking in or out of it
+        self.focused = False
+        #Whether the textarea can be typed in
+        self.editable = True
+        self.hover = False
+
+        #Box component of the textarea, which is drawn by the textarea rather than the window
+        self.__box = rect(self.__window,self.x1,self.y1,self.x2,self.y2,self.background,(0,0,0),1)
+        delete(self.__box)
+
+        self.__window.scene.add(self)
+
+    #Whole text, joined with newlines
+    @property
+    def content(self):
+        return("\n".join(self.lines))
+
+    @content.setter
+    def content(self, content):
+        self.lines = content.split("\n")
+        self.__clamp_cursor()
+
+    #Add text to the end, such as new lines of a log, without joining and splitting the whole text
+    def append(self, content):
+        self.__clamp_cursor()
+        new = content.split("\n")
+        self.lines[-1] = self.lines[-1] + new[0]
+        self.lines.extend(new[1:])
+
+    #Number of whole lines that fit in the box
+    def lines_shown(self):
+        top, bottom = hitbox(self.__window,self.x1,self.y1,self.x2,self.y2)[1::2]
+        return(max(1,(bottom-top)//line_skip(self.font,make_height(self.__window,self.size))))
+
+    def display(self):
+        self.update()
+        self.draw()
+
+    #Update the box, focus and cursor from the mouse, add any typed keys to the text and scroll
+    def update(self):
+        #The lines may have been changed since the last update, such as by trimming a log
+        self.__clamp_cursor()
+        window = self.__window
+        box = self.__box
+        box.x1, box.y1, box.x2, box.y2 = self.x1, self.y1, self.x2, self.y2
+        box.colour = self.background
+        box.update()
+        self.hover = box.hover
+        area = hitbox(window,self.x1,self.y1,self.x2,self.y2)
+        size = make_height(window,self.size)
+        skip = line_skip(self.font,size)
+        shown = max(1,(area[3]-area[1])//skip)
+        moved = False
+
+        #A new click focuses the textarea and moves the cursor to it, or unfocuses it if it misses
+        if not window.mouse_held and window.mouse_down:
+            self.focused = self.hover
+            if self.hover:
+                line = min(len(self.lines)-1,self.scroll + (window.mouse_y-area[1])//skip)
+                self.cursor_line = line
+                self.cursor_column = column_at(self.font,size,self.lines[line],window.mouse_x-area[0]-measure_text(self.font,size," ")[0])
+                moved = True
+
+        #Edit the text and move the cursor, in the order keys were pressed
+        if self.focused:
+            for kind, key in window.key_events:
+                if kind == "up":
+                    continue
+                moved = self.__key(kind,key,shown) or moved
+
+        #Scroll with the mouse wheel over the box, otherwise keep the cursor in view after it moves
+        if self.hover and window.wheel:
+            self.scroll -= window.wheel * self.wheel_lines
+        elif moved:
+            if self.cursor_line < self.scroll:
+                self.scroll = self.cursor_line
+            elif self.cursor_line >= self.scroll + shown:
+                self.scroll = self.cursor_line - shown + 1
+        self.scroll = max(0,min(self.scroll,len(self.lines)-shown))
+
+        #Extra animations for if the textarea is focused, like a textbox
+        if self.focused:
+            box.border_thickness = 2
+            box.border_colour = (255,0,0)
+        elif self.hover:
+            box.border_thickness = 1
+            box.border_colour = (255,0,0)
+        else:
+            box.border_thickness = 1
+            box.border_colour = (0,0,0)
 
-        self.__box.display()
-        self.__text.display()
+    def draw(self):
+        self.__box.draw()
+        backend = self.__window.backend
+        xmin, ymin, xmax, ymax = hitbox(self.__window,self.x1,self.y1,self.x2,self.y2)
+        size = make_height(self.__window,self.size)
+        skip = line_skip(self.font,size)
+        pad = measure_text(self.font,size," ")[0]
+        width = xmax - xmin - pad
+        if width <= 0:
+            return
+        #Only the lines in view are rendered, each cut off at the right of the box
+        first = self.scroll
+        last = min(len(self.lines),first + max(1,(ymax-ymin)//skip))
+        for index in range(first,last):
+            line = self.lines[index]
+            if line:
+                surface = cached_text(self.font,size,self.colour,line)
+                y = ymin + (index-first)*skip
+                backend.blit(surface,xmin+pad,y,(0,0,min(surface.w,width),min(surface.h,ymax-y)))
+        if self.focused and first <= self.cursor_line < last:
+            x = xmin + pad + measure_text(self.font,size,self.lines[self.cursor_line][:self.cursor_column])[0]
+            if x < xmax:
+                y = ymin + (self.cursor_line-first)*skip
+                backend.line(self.colour,x,y,x,min(y+skip,ymax)-1)
+
+    #Move the textarea by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+        self.x2 = shift(self.x2,dx,self.__window.width)
+        self.y2 = shift(self.y2,dy,self.__window.height)
+
+    #Area of the screen (px) that the textarea is drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        return(self.__box.bounds())
+
+    #Everything other than position that affects how the textarea looks, which only includes the lines in view
+    def snapshot(self):
+        shown = self.lines_shown()
+        cursor = (self.cursor_line,self.cursor_column) if self.focused else None
+        return((self.__box.snapshot(),self.size,self.font,self.colour,self.scroll,tuple(self.lines[self.scroll:self.scroll+shown]),cursor))
+
+    #Apply one key event, returning True if the cursor may have moved
+    def __key(self, kind, key, shown):
+        lines = self.lines
+        line = self.cursor_line
+        column = self.cursor_column
+        text = lines[line]
+        if kind == "text":
+            if not self.editable:
+                return(False)
+            lines[line] = text[:column] + key + text[column:]
+            column += len(key)
+        elif key == "LEFT":
+            if column > 0:
+                column -= 1
+            elif line > 0:
+                line -= 1
+                column = len(lines[line])
+        elif key == "RIGHT":
+            if column < len(text):
+                column += 1
+            elif line < len(lines)-1:
+                line += 1
+                column = 0
+        elif key in ["UP","DOWN","PAGEUP","PAGEDOWN"]:
+            step = {"UP":-1,"DOWN":1,"PAGEUP":-shown,"PAGEDOWN":shown}[key]
+            line = max(0,min(len(lines)-1,line+step))
+            column = min(column,len(lines[line]))
+        elif key == "HOME":
+            column = 0
+        elif key == "END":
+            column = len(text)
+        elif not self.editable:
+            return(False)
+        elif key == "ENTER":
+            lines[line:line+1] = [text[:column],text[column:]]
+            line += 1
+            column = 0
+        elif key == "BACKSPACE":
+            if column > 0:
+                lines[line] = text[:column-1] + text[column:]
+                column -= 1
+            elif line > 0:
+                column = len(lines[line-1])
+                lines[line-1] = lines[line-1] + lines.pop(line)
+                line -= 1
+        elif key == "DEL":
+            if column < len(text):
+                lines[line] = text[:column] + text[column+1:]
+            elif line < len(lines)-1:
+                lines[line] = text + lines.pop(line+1)
+        else:
+            return(False)
+        self.cursor_line = line
+        self.cursor_column = column
+        return(True)
+
+    #Keep the cursor inside the text after it has been replaced, treating no lines as one empty line
+    def __clamp_cursor(self):
+        if not self.lines:
+            self.lines.append("")
+        self.cursor_line = max(0,min(self.cursor_line,len(self.lines)-1))
+        self.cursor_column = max(0,min(self.cursor_column,len(self.lines[self.cursor_line])))
 
 class image:
-    def __init__(self,window,path,x1,y1,height=False,width=False):
+    def __init__(self,window,path,x1,y1,height=False,width=False,asynchronous=False,placeholder=False):
         self.__window = window
         self.path = path
+        #Path the absolute path was last worked out for, as the image cache is keyed by absolute path
+        self.__path = None
+        self.__absolute = None
         self.x1 = x1
         self.y1 = y1
         self.height = height
@@ -413,10 +1746,20 @@ class image:
         self.__hard_width = 0
         self.__hard_height = 0
         self.visible = True
-
-        img = Image.open(self.path)
-        self.aspect_ratio = img.size[0]/img.size[1]
-        start = make_pos(self.__window,(self.x1,self.y1))
+        #If asynchronous, the file is decoded and scaled on a background thread, and placeholder (a colour, or False for nothing) is drawn until it is ready
+        self.asynchronous = asynchronous
+        self.placeholder = placeholder
+        #Whether the image is ready to draw at its current size
+        self.loaded = not asynchronous
+        #Function called with the image the first time it is ready to draw
+        self.on_loaded = None
+        self.__notified = False
+        #px size last drawn, and the size stretched to the current size when a new one isn't ready to draw
+        self.__drawn = None
+        self.__stretch = None
+
+        img_width, img_height = image_size(self.path)
+        self.aspect_ratio = img_width/img_height
 
         #If either width or height is undefined, define it using the other dimension and the aspect ratio of the image
         if self.width:
@@ -439,106 +1782,297 @@ class image:
 
         self.__hard_width = width
         self.__hard_height = height
-        
-        #resize the image and save it to the 'images' folder, then reload the saved image
-        img = img.resize((width,height))
-        path = self.path.split(".")
-        path = path[0] + "_PyGraphica_cropped." + path[1]
-        img.save(path)
-        self.__img = sdl2.ext.image.load_image(path)
 
-        all_shapes.append(self)
+        self.__window.scene.add(self)
 
-        start_x = int(self.x1)
-        start_y = int(self.y1)
-        width = int(self.width)
-        height = int(self.height)
-
-        #Calculate the endpoint depending on the position of the origin
-        if self.__window.origin in [0,2,4]:
-            end_x = start_x + width
-        else:
-            end_x = start_x - width
-            
-        if self.__window.origin in [0,1]:
-            end_y = start_y + height
-        else:
-            end_y = start_y - height
-
-        #Define the endpoint in the format that the start was given in
-        if type(self.width) == str:
-            self.x2 = str(end_x)
-            self.y2 = str(end_y)
-        else:
-            self.x2 = end_x
-            self.y2 = end_y
+        self.__set_end()
     
     def display(self):
-        path = self.path.split(".")
-        path = path[0] + "_PyGraphica_cropped." + path[1]
-        img = Image.open(path)
+        self.update()
+        self.draw()
 
+    #Update the size of the image, keeping its aspect ratio if only one dimension has changed
+    def update(self):
         width = make_width(self.__window,self.width)
-        self.__hard_width = width
         height = make_height(self.__window,self.height)
-        self.__hard_height = height
-
-        start = make_pos(self.__window,(self.x1,self.y1))
-        end = make_pos(self.__window,(self.x2,self.y2))
-
-        resize = True
 
         #Check if any sizing has changed
-        if self.__hard_width != img.width and self.__hard_height != img.height:
+        if width != self.__hard_width and height != self.__hard_height:
             pass
-        elif self.__hard_width != img.width:
+        elif width != self.__hard_width:
             height = int(width * (1/self.aspect_ratio))
             if type(self.width) == str:
                 self.height = rela_height(self.__window,height)
             else:
                 self.height = height
-        elif self.__hard_height != img.height:
+        elif height != self.__hard_height:
             width = int(height * self.aspect_ratio)
             if type(self.height) == str:
                 self.width = rela_width(self.__window,width)
             else:
                 self.width = width
-        else:
-            resize = False
-        
-        #If necessary, rewrite image (copy) into new size, then load resized image
-        if resize:
-            img = Image.open(self.path)
-            img = img.resize((width,height))
-            path = self.path.split(".")
-            path = path[0] + "_PyGraphica_cropped." + path[1]
-            img.save(path)
-            self.__img = sdl2.ext.image.load_image(path)
 
+        if (width,height) != (self.__hard_width,self.__hard_height):
             self.__hard_width = width
             self.__hard_height = height
+            self.__set_end()
 
-            start_x = int(self.x1)
-            start_y = int(self.y1)
-            width = int(self.width)
-            height = int(self.height)
+        #While the window is being resized, or a new size is loading in the background, the last size drawn is stretched instead
+        ready = (self.__file(),width,height) in image_cache
+        if not ready and (self.__window.resizing or self.asynchronous):
+            self.__stretch = self.__drawn
+        else:
+            self.__stretch = None
+
+        #Start loading the current size in the background if it isn't ready, and let the program know once it first is
+        if self.asynchronous:
+            self.loaded = ready
+            if not self.loaded and not self.__window.resizing:
+                load_image(self.__file(),width,height)
+            elif self.loaded and not self.__notified:
+                self.__notified = True
+                if self.on_loaded:
+                    self.on_loaded(self)
+
+    def draw(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        if self.__stretch is not None:
+            img = image_cache.get((self.__file(),)+self.__stretch)
+            if img is not None:
+                self.__window.backend.stretch(img,start[0],start[1],self.__hard_width,self.__hard_height)
+                return
+        if not self.loaded:
+            if self.placeholder:
+                self.__window.backend.fill(self.placeholder,(start[0],start[1],self.__hard_width,self.__hard_height))
+            return
+        #Scaled copies are kept in memory, so this only decodes the file the first time a size is used
+        img = scaled_image(self.__file(),self.__hard_width,self.__hard_height)
+        self.__drawn = (self.__hard_width,self.__hard_height)
+        self.__window.backend.blit(img,start[0],start[1])
+
+    #Move the image by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+
+    #Area of the screen (px) that the image is drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        return((start[0],start[1],start[0]+self.__hard_width,start[1]+self.__hard_height))
+
+    #Everything other than position that affects how the image looks
+    def snapshot(self):
+        return((self.path,self.__hard_width,self.__hard_height,self.loaded,self.placeholder,self.__stretch))
+
+    #Absolute path of the image file, only worked out again when path has changed
+    def __file(self):
+        if self.path != self.__path:
+            self.__path = self.path
+            self.__absolute = os.path.abspath(self.path)
+        return(self.__absolute)
+
+    #Calculate the endpoint depending on the position of the origin, in the format that the start was given in
+    def __set_end(self):
+        #Coordinates of objects that have been moved may be fractions
+        start_x = float(self.x1)
+        start_y = float(self.y1)
+        width = float(self.width)
+        height = float(self.height)
 
-            if self.__window.origin in [0,2,4]:
-                end_x = start_x + width
-            else:
-                end_x = start_x - width
-                
-            if self.__window.origin in [0,1]:
-                end_y = start_y + height
-            else:
-                end_y = start_y - height
+        if self.__window.origin in [0,2,4]:
+            end_x = start_x + width
+        else:
+            end_x = start_x - width
+            
+        if self.__window.origin in [0,1]:
+            end_y = start_y + height
+        else:
+            end_y = start_y - height
 
-            if type(self.width) == str:
-                self.end = (str(end_x),str(end_y))
+        if type(self.width) == str:
+            self.x2 = percent(end_x)
+            self.y2 = percent(end_y)
+        else:
+            self.x2 = int(end_x)
+            self.y2 = int(end_y)
+
+#Many frames kept in one image, so they are loaded once and every sprite using them draws from the same surface
+class atlas:
+    def __init__(self, img, frames, names=None):
+        #PIL image holding every frame
+        self.image = img
+        #(x, y, w, h) area of each frame in the image
+        self.frames = frames
+        #Index of each frame by name
+        self.names = {}
+        if names:
+            self.names = {name:index for index,name in enumerate(names)}
+        self.__opaque = img.mode == "RGB"
+        #Where each frame is in the copy of the image scaled by (sx, sy), by (sx, sy)
+        self.__layouts = {(1,1):frames}
+        self.__key = ("atlas",next(atlas_keys))
+
+    #Index of a frame given by index or name
+    def index(self, frame):
+        if type(frame) == str:
+            return(self.names[frame])
+        return(frame)
+
+    #px (w, h) of a frame before scaling
+    def size(self, frame):
+        area = self.frames[self.index(frame)]
+        return((area[2],area[3]))
+
+    #Whether the copy scaled by (sx, sy) is already made
+    def ready(self, sx, sy):
+        return(self.__key + (round(sx,6),round(sy,6)) in image_cache)
+
+    #Surface of every frame scaled by (sx, sy), and the (x, y, w, h) area of each frame in it, made once per scale and kept in the image cache
+    def scaled(self, sx, sy):
+        scale = (round(sx,6),round(sy,6))
+        key = self.__key + scale
+        surface = image_cache.get(key)
+        if surface is None:
+            if scale == (1,1):
+                img = self.image
             else:
-                self.end = (end_x,end_y)
-        
-        sdl2.SDL_BlitSurface(self.__img,None,self.__window.surface,sdl2.SDL_Rect(start[0],start[1],end[0],end[1]))
+                #Frames are scaled one at a time and packed again, so scaling never blends neighbouring frames together
+                sizes = [(max(1,round(w*sx)),max(1,round(h*sy))) for x,y,w,h in self.frames]
+                positions, width, height = pack_sizes(sizes)
+                img = Image.new(self.image.mode,(width,height))
+                for (x,y,w,h),size,position in zip(self.frames,sizes,positions):
+                    img.paste(self.image.crop((x,y,x+w,y+h)).resize(size),position)
+                self.__layouts[scale] = [position+size for size,position in zip(sizes,positions)]
+            surface = pillow_surface(img,self.__opaque)
+            counters["images loaded"] += 1
+            image_cache.put(key,surface,img.width*img.height*4)
+        return((surface,self.__layouts[scale]))
+
+#Load a sprite sheet of equally sized frames, read left to right then top to bottom, as an atlas
+def sprite_sheet(path, frame_width, frame_height, count=None, names=None):
+    img = decode_image(path)[0]
+    frames = []
+    for y in range(0,img.height - frame_height + 1,frame_height):
+        for x in range(0,img.width - frame_width + 1,frame_width):
+            frames.append((x,y,frame_width,frame_height))
+    if count is not None:
+        frames = frames[:count]
+    return(atlas(img,frames,names))
+
+#Pack many small image files into one atlas when they are loaded, with each frame named by its path unless names are given
+def pack_images(paths, names=None):
+    images = [decode_image(path) for path in paths]
+    mode = "RGB" if all(opaque for img,opaque in images) else "RGBA"
+    positions, width, height = pack_sizes([img.size for img,opaque in images])
+    sheet = Image.new(mode,(width,height))
+    for (img,opaque),position in zip(images,positions):
+        sheet.paste(img.convert(mode),position)
+    return(atlas(sheet,[position+img.size for (img,opaque),position in zip(images,positions)],names or paths))
+
+#Image drawn from one frame of an atlas at a time, which can be animated
+class sprite:
+    def __init__(self,window,sheet,x1,y1,frame=0,height=False,width=False):
+        self.__window = window
+        self.atlas = sheet
+        self.x1 = x1
+        self.y1 = y1
+        #Index or name of the frame drawn
+        self.frame = frame
+        #Size of the first frame of the atlas when drawn, False to scale by the other dimension or keep the frame's own size if both are False
+        self.height = height
+        self.width = width
+        self.visible = True
+        #Frames played in order by play(), at fps frames per second
+        self.animation = []
+        self.fps = 0
+        self.loop = True
+        self.playing = False
+        self.__time = 0
+        #Scale last drawn, and the scale stretched to the current size while the window is being resized
+        self.__drawn = None
+        self.__stretch = None
+        self.update()
+        self.__window.scene.add(self)
+
+    def display(self):
+        self.update()
+        self.draw()
+
+    #Start playing a list of frames, given by index or name
+    def play(self, frames, fps, loop=True):
+        self.animation = list(frames)
+        self.fps = fps
+        self.loop = loop
+        self.playing = True
+        self.__time = 0
+        self.frame = self.animation[0]
+
+    def stop(self):
+        self.playing = False
+
+    #Move the animation on by the time since the last frame, then work out the size and endpoint of the current frame
+    def update(self):
+        if self.playing and self.animation:
+            self.__time += self.__window.delta
+            length = len(self.animation)
+            step = int(self.__time * self.fps)
+            if step >= length:
+                if self.loop:
+                    self.__time %= length / self.fps
+                    step %= length
+                else:
+                    step = length - 1
+                    self.playing = False
+            self.frame = self.animation[step]
+
+        #Scale every frame by how much the first frame is scaled
+        first_width, first_height = self.atlas.size(0)
+        if self.width:
+            sx = make_width(self.__window,self.width) / first_width
+        if self.height:
+            sy = make_height(self.__window,self.height) / first_height
+        if not self.width:
+            sx = sy if self.height else 1
+        if not self.height:
+            sy = sx
+        self.__scale = (sx,sy)
+        w, h = self.atlas.size(self.frame)
+        self.__size = (max(1,round(w*sx)),max(1,round(h*sy)))
+        if self.__window.resizing and self.__drawn is not None and not self.atlas.ready(sx,sy):
+            self.__stretch = self.__drawn
+        else:
+            self.__stretch = None
+
+        #Endpoint in the same units as the start, for collision()
+        x_dir = -1 if self.__window.origin in [1,3] else 1
+        y_dir = -1 if self.__window.origin in [2,3,4] else 1
+        self.x2 = shift(self.x1,x_dir*self.__size[0],self.__window.width)
+        self.y2 = shift(self.y1,y_dir*self.__size[1],self.__window.height)
+
+    def draw(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        #The atlas isn't scaled again for every size while the window is being resized
+        if self.__stretch is not None and self.atlas.ready(*self.__stretch):
+            surface, areas = self.atlas.scaled(*self.__stretch)
+            self.__window.backend.stretch(surface,start[0],start[1],self.__size[0],self.__size[1],areas[self.atlas.index(self.frame)])
+            return
+        surface, areas = self.atlas.scaled(*self.__scale)
+        self.__drawn = self.__scale
+        self.__window.backend.blit(surface,start[0],start[1],areas[self.atlas.index(self.frame)])
+
+    #Move the sprite by (dx, dy) px in the user's coordinate system
+    def move(self, dx, dy):
+        self.x1 = shift(self.x1,dx,self.__window.width)
+        self.y1 = shift(self.y1,dy,self.__window.height)
+
+    #Area of the screen (px) that the sprite is drawn on, as (xmin, ymin, xmax, ymax)
+    def bounds(self):
+        start = make_pos(self.__window,(self.x1,self.y1))
+        return((start[0],start[1],start[0]+self.__size[0],start[1]+self.__size[1]))
+
+    #Everything other than position that affects how the sprite looks
+    def snapshot(self):
+        return((self.atlas,self.atlas.index(self.frame),self.__scale,self.__stretch))
 
 #Check for overlap between two objects
 def collision(object1, object2):
@@ -553,27 +2087,418 @@ def collision(object1, object2):
         overlap = False
     return(overlap)
 
-#Move an object to the back of the displaying list (so it is in front of the screen)
+#Hitboxes of a list of objects as an (n, 4) array of (xmin, ymin, xmax, ymax), resolved into px if a window is given
+def collision_boxes(objects, window=None):
+    need_numpy()
+    if window is None:
+        #Like collision(), use the coordinates as given
+        boxes = numpy.array([(obj.x1,obj.y1,obj.x2,obj.y2) for obj in objects],dtype=float).reshape(-1,4)
+    else:
+        boxes = numpy.array([make_pos(window,(obj.x1,obj.y1))+make_pos(window,(obj.x2,obj.y2)) for obj in objects],dtype=float).reshape(-1,4)
+    return(numpy.column_stack((
+        numpy.minimum(boxes[:,0],boxes[:,2]),
+        numpy.minimum(boxes[:,1],boxes[:,3]),
+        numpy.maximum(boxes[:,0],boxes[:,2]),
+        numpy.maximum(boxes[:,1],boxes[:,3]),
+    )))
+
+#Check every object in objects1 against every object in objects2 (or objects1 against itself) at once, matching collision() for each pair
+def collision_matrix(objects1, objects2=None, window=None):
+    need_numpy()
+    a = objects1 if isinstance(objects1,numpy.ndarray) else collision_boxes(objects1,window)
+    if objects2 is None:
+        b = a
+    else:
+        b = objects2 if isinstance(objects2,numpy.ndarray) else collision_boxes(objects2,window)
+    #Touching edges count as overlap, as they do in collision()
+    return(
+        (a[:,None,0] <= b[None,:,2]) & (b[None,:,0] <= a[:,None,2]) &
+        (a[:,None,1] <= b[None,:,3]) & (b[None,:,1] <= a[:,None,3])
+    )
+
+#Index pairs (i, j), with i < j, of every two objects in a list that overlap
+def collision_pairs(objects, window=None):
+    matrix = collision_matrix(objects,window=window)
+    i, j = numpy.nonzero(numpy.triu(matrix,1))
+    return(list(zip(i.tolist(),j.tolist())))
+
+#Every object in a list that overlaps obj, e.g. a bullet against all enemies
+def colliding(obj, objects, window=None):
+    objects = list(objects)
+    hits = collision_matrix([obj],objects,window)[0]
+    return([objects[i] for i in numpy.flatnonzero(hits)])
+
+#Spatial hash of object hitboxes, for finding collisions between many objects without testing every pair
+class collision_grid:
+    def __init__(self, window, shapes=None, cell_size=64):
+        self.__window = window
+        self.cell_size = cell_size
+        #If no shapes are given the grid follows every displayed shape, plus any added with add()
+        self.__follow = shapes is None
+        self.__shapes = [] if shapes is None else list(shapes)
+        #Objects in each cell, using dicts as ordered sets
+        self.__cells = {}
+        #Hitbox (px) and cell range of each object, and the coordinates they were worked out from
+        self.__boxes = {}
+        self.__ranges = {}
+        self.__coords = {}
+        self.__size = (window.width, window.height)
+        self.update()
+
+    def add(self, obj):
+        self.__shapes.append(obj)
+        self.__place(obj)
+
+    def remove(self, obj):
+        self.__shapes.remove(obj)
+        if not (self.__follow and obj in self.__window.scene):
+            self.__unplace(obj)
+
+    #Move any objects whose coordinates have changed since the last update into their new cells, call once per frame after moving things
+    def update(self):
+        if (self.__window.width, self.__window.height) != self.__size:
+            #Relative coordinates all move when the window is resized
+            self.__size = (self.__window.width, self.__window.height)
+            self.__coords.clear()
+        if self.__follow:
+            current = dict.fromkeys(list(self.__window.scene) + self.__shapes)
+        else:
+            current = dict.fromkeys(self.__shapes)
+        for obj in list(self.__boxes):
+            if obj not in current:
+                self.__unplace(obj)
+        for obj in current:
+            if self.__coords.get(obj) != (obj.x1,obj.y1,obj.x2,obj.y2):
+                self.__place(obj)
+
+    #Objects whose hitboxes overlap an area, given in the same coordinate system as the objects
+    def query_region(self, x1, y1, x2, y2):
+        return(self.__query(hitbox(self.__window,x1,y1,x2,y2)))
+
+    #Objects whose hitboxes overlap obj's
+    def colliding_with(self, obj):
+        box = self.__boxes.get(obj)
+        if box is None:
+            box = hitbox(self.__window,obj.x1,obj.y1,obj.x2,obj.y2)
+        return([other for other in self.__query(box) if other is not obj])
+
+    #Every pair of objects whose hitboxes overlap
+    def all_colliding_pairs(self):
+        pairs = []
+        size = self.cell_size
+        boxes = self.__boxes
+        for cell, members in self.__cells.items():
+            members = list(members)
+            for i in range(len(members)):
+                a = boxes[members[i]]
+                for j in range(i+1,len(members)):
+                    b = boxes[members[j]]
+                    if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                        #Pairs sharing several cells are only reported from the cell holding the corner of their overlap
+                        if (max(a[0],b[0])//size,max(a[1],b[1])//size) == cell:
+                            pairs.append((members[i],members[j]))
+        return(pairs)
+
+    def __query(self, box):
+        found = {}
+        cells = self.__cells
+        x_min, y_min, x_max, y_max = self.__range(box)
+        for cx in range(x_min,x_max+1):
+            for cy in range(y_min,y_max+1):
+                members = cells.get((cx,cy))
+                if members:
+                    found.update(members)
+        boxes = self.__boxes
+        return([obj for obj in found if box[0] <= boxes[obj][2] and boxes[obj][0] <= box[2] and box[1] <= boxes[obj][3] and boxes[obj][1] <= box[3]])
+
+    #Cells covered by a hitbox, as (first column, first row, last column, last row)
+    def __range(self, box):
+        size = self.cell_size
+        return((box[0]//size,box[1]//size,box[2]//size,box[3]//size))
+
+    def __place(self, obj):
+        self.__coords[obj] = (obj.x1,obj.y1,obj.x2,obj.y2)
+        box = hitbox(self.__window,obj.x1,obj.y1,obj.x2,obj.y2)
+        self.__boxes[obj] = box
+        new = self.__range(box)
+        old = self.__ranges.get(obj)
+        if new == old:
+            return
+        if old is not None:
+            self.__unlink(obj,old)
+        self.__ranges[obj] = new
+        for cx in range(new[0],new[2]+1):
+            for cy in range(new[1],new[3]+1):
+                self.__cells.setdefault((cx,cy),{})[obj] = None
+
+    def __unplace(self, obj):
+        self.__unlink(obj,self.__ranges.pop(obj))
+        del self.__boxes[obj]
+        del self.__coords[obj]
+
+    def __unlink(self, obj, cells):
+        for cx in range(cells[0],cells[2]+1):
+            for cy in range(cells[1],cells[3]+1):
+                members = self.__cells[(cx,cy)]
+                del members[obj]
+                if not members:
+                    del self.__cells[(cx,cy)]
+
+#Shapes and other groups drawn together, which can be hidden, moved, reordered or deleted in one go
+class group:
+    def __init__(self, scene, name=None):
+        self.scene = scene
+        self.name = name
+        #Group or layer this group is in, None if it is a layer or has been deleted
+        self.parent = None
+        #Flag for whether the group's shapes should be displayed or not
+        self.visible = True
+        #Each member's place in the drawing order; to_front and to_back give one member a new number instead of moving every other member
+        self.__order = {}
+        self.__front = 0
+        self.__back = 0
+        #Members in drawing order, only sorted again after the order has changed
+        self.__sorted = []
+        self.__changed = False
+
+    #Add shapes or groups to the front of the group, taking them out of the group or layer they were in
+    def add(self, *objs):
+        for obj in objs:
+            ancestor = self
+            while ancestor is not None:
+                if ancestor is obj:
+                    raise ValueError("A group can't be put inside itself.")
+                ancestor = ancestor.parent
+            if getattr(obj,"parent",None) is not None:
+                obj.parent.__detach(obj)
+            self.__order[obj] = self.__front
+            self.__front += 1
+            obj.parent = self
+            if not self.__changed:
+                self.__sorted.append(obj)
+
+    #Take a shape or group out of the group, forgetting the names of any groups removed
+    def remove(self, obj):
+        self.__detach(obj)
+        if type(obj) == group:
+            obj.__forget()
+
+    def to_front(self, obj):
+        self.__check(obj)
+        self.__order[obj] = self.__front
+        self.__front += 1
+        self.__changed = True
+
+    def to_back(self, obj):
+        self.__check(obj)
+        self.__back -= 1
+        self.__order[obj] = self.__back
+        self.__changed = True
+
+    #Move every shape in the group, in the user's coordinate system
+    def move(self, dx, dy):
+        for obj in self:
+            obj.move(dx,dy)
+
+    #Remove the group, and everything in it, from the window
+    def delete(self):
+        if self.parent is None:
+            raise ValueError("Only groups that are being displayed can be deleted.")
+        self.parent.remove(self)
+
+    #Add every shape in the group to a list in drawing order, skipping hidden groups unless hidden is True
+    def collect(self, shapes, hidden=False):
+        for obj in self.__members():
+            if type(obj) == group:
+                if obj.visible or hidden:
+                    obj.collect(shapes,hidden)
+            else:
+                shapes.append(obj)
+
+    #Members in drawing order, from back to front
+    def __iter__(self):
+        return(iter(list(self.__members())))
+
+    def __len__(self):
+        return(len(self.__order))
+
+    def __members(self):
+        if self.__changed:
+            self.__sorted = sorted(self.__order,key=self.__order.get)
+            self.__changed = False
+        return(self.__sorted)
+
+    def __check(self, obj):
+        if obj not in self.__order:
+            raise ValueError("The object is not in this group.")
+
+    def __detach(self, obj):
+        self.__check(obj)
+        del self.__order[obj]
+        obj.parent = None
+        self.__changed = True
+
+    def __forget(self):
+        if self.scene.groups.get(self.name) is self:
+            del self.scene.groups[self.name]
+        for obj in self:
+            if type(obj) == group:
+                obj.__forget()
+
+#Everything a window draws, in numbered layers drawn from the lowest number up, each holding shapes and groups
+class scene:
+    def __init__(self):
+        self.__layers = {}
+        self.__numbers = []
+        #Named groups, by name
+        self.groups = {}
+
+    #Get the group at the root of a layer, making it if it doesn't exist yet
+    def layer(self, number=0):
+        if number not in self.__layers:
+            self.__layers[number] = group(self)
+            self.__numbers = sorted(self.__layers)
+        return(self.__layers[number])
+
+    #Get a named group, making it in the front of a layer if it doesn't exist yet
+    def group(self, name, layer=0):
+        if name not in self.groups:
+            self.groups[name] = group(self,name)
+            self.layer(layer).add(self.groups[name])
+        return(self.groups[name])
+
+    #Add a shape to the front of a layer, which is how shapes join the window they are made for
+    def add(self, obj, layer=0):
+        self.layer(layer).add(obj)
+
+    #Every shape that should be displayed this frame, in drawing order, leaving out hidden groups and layers
+    def drawn(self):
+        shapes = []
+        for number in self.__numbers:
+            if self.__layers[number].visible:
+                self.__layers[number].collect(shapes)
+        return(shapes)
+
+    #Every shape in the window, including ones in hidden groups
+    def __iter__(self):
+        shapes = []
+        for number in self.__numbers:
+            self.__layers[number].collect(shapes,True)
+        return(iter(shapes))
+
+    def __contains__(self, obj):
+        parent = getattr(obj,"parent",None)
+        while parent is not None and parent.parent is not None:
+            parent = parent.parent
+        return(any(parent is layer for layer in self.__layers.values()))
+
+#Move an object to the back of the displaying list of its group or layer (so it is in front of the screen)
 def to_front(obj):
-    all_shapes.remove(obj)
-    all_shapes.append(obj)
+    displayed_parent(obj).to_front(obj)
 
-#Move an object to the front of the displaying list (so it is at the back of the screen)
+#Move an object to the front of the displaying list of its group or layer (so it is at the back of the screen)
 def to_back(obj):
-    all_shapes.remove(obj)
-    all_shapes.insert(0,obj)
+    displayed_parent(obj).to_back(obj)
 
-#Delete an object
+#Delete an object or group
 def delete(obj):
-    try:
-        all_shapes.remove(obj)
-    except:
-        pass
+    displayed_parent(obj).remove(obj)
+
+#Let text objects with the same content, size, colour and font share a single rendered surface
+def share_text(enabled=True):
+    global shared_text
+    shared_text = enabled
+    if not enabled:
+        text_cache.clear()
+
+#Start loading images in the background, each given as a path (to load at its own size) or (path, width, height) for the px size it will be drawn at, calling progress(done, total) on the main thread as each one is ready
+def preload(images, progress=None):
+    tracker = load_progress(len(images),progress)
+    for item in images:
+        if type(item) == str:
+            load_image(item,progress=tracker)
+        else:
+            load_image(*item,progress=tracker)
+    return(tracker)
+
+#Count of images loaded by a call to preload()
+class load_progress:
+    def __init__(self, total, callback=None):
+        self.done = 0
+        self.total = total
+        self.callback = callback
+
+    def finish(self):
+        self.done += 1
+        if self.callback:
+            self.callback(self.done,self.total)
+
+    #Whether every image has loaded
+    def finished(self):
+        return(self.done >= self.total)
+
+#Measure the (width, height) in px that content would have if rendered in a font at a px size, without rendering it
+def measure_text(font, size, content):
+    key = (font, size, content)
+    measured = metrics_cache.get(key)
+    if measured is None:
+        #Metrics don't depend on colour, so every measurement uses the white copy of the font
+        ttf = ctypes.byref(get_font(font,size,colours.WHITE).get_ttf_font())
+        lines = content.split("\n")
+        width = 0
+        for line in lines:
+            if line:
+                line_width, line_height = ctypes.c_int(0), ctypes.c_int(0)
+                sdl2.sdlttf.TTF_SizeUTF8(ttf,line.encode(),ctypes.byref(line_width),ctypes.byref(line_height))
+                width = max(width,line_width.value)
+        #Lines are spaced like sdl2.ext's FontTTF.render_text spaces them
+        measured = (width,sdl2.sdlttf.TTF_FontLineSkip(ttf)*(len(lines)-1) + sdl2.sdlttf.TTF_FontHeight(ttf))
+        metrics_cache.put(key,measured)
+    return(measured)
 
 #ALL FUNCTIONS BELOW THIS POINT ARE NOT INTENDED TO BE USED OUTSIDE Of THE MODULE
 
+#Rendered surface of some text from the shared text cache, rendering it only if it isn't there
+def cached_text(font, size, colour, content):
+    key = (content,size,tuple(colour),font)
+    surface = text_cache.get(key)
+    if surface is None:
+        surface = get_font(font,size,colour).render_text(content)
+        counters["text rendered"] += 1
+        text_cache.put(key,surface)
+    return(surface)
+
+#Distance (px) from the top of one line of text to the top of the next
+def line_skip(font, size):
+    return(sdl2.sdlttf.TTF_FontLineSkip(ctypes.byref(get_font(font,size,colours.WHITE).get_ttf_font())))
+
+#Column of a line of text nearest to a distance x (px) from its start, found by measuring prefixes in a binary search
+def column_at(font, size, line, x):
+    low, high = 0, len(line)
+    while low < high:
+        middle = (low + high + 1)//2
+        if measure_text(font,size,line[:middle])[0] <= x:
+            low = middle
+        else:
+            high = middle - 1
+    #Round to whichever side of the character under x is nearer
+    if low < len(line) and x - measure_text(font,size,line[:low])[0] > (measure_text(font,size,line[:low+1])[0] - measure_text(font,size,line[:low])[0])/2:
+        low += 1
+    return(low)
+
 #Turn static (px) or relative (%) coordinates in the user's origin system into static coordinates based on a top-left origin
 def make_pos(window,pos):
+    #Coordinates are only worked out the first time they are used with the window's current size and origin
+    resolved = window.coord_cache.get(pos)
+    if resolved is None:
+        resolved = resolve_pos(window,pos)
+        if len(window.coord_cache) > 65536:
+            window.coord_cache.clear()
+        window.coord_cache[pos] = resolved
+    return(resolved)
+
+#Work out the px coordinates for make_pos
+def resolve_pos(window,pos):
     x,y = pos
     if type(x) == str:
         if window.origin in [0,2]:
@@ -607,16 +2532,180 @@ def make_pos(window,pos):
     
     return((x,y))
 
+#make_pos for whole arrays of x and y coordinates at once, all in px or all in % of the window if relative is True
+def resolve_points(window,x,y,relative=False):
+    if relative:
+        x = numpy.asarray(x,dtype=float)
+        y = numpy.asarray(y,dtype=float)
+        if window.origin in [0,2]:
+            x = window.width * x / 100
+        elif window.origin in [1,3]:
+            x = window.width * ((100 - x) / 100)
+        elif window.origin == 4:
+            x = window.width * ((50 + x) / 100)
+        if window.origin in [0,1]:
+            y = window.height * y / 100
+        elif window.origin in [2,3]:
+            y = window.height * ((100 - y) / 100)
+        elif window.origin == 4:
+            y = window.height * ((50 - y) / 100)
+        #int() rounds towards zero, like make_pos does
+        return((numpy.trunc(x).astype(numpy.int64),numpy.trunc(y).astype(numpy.int64)))
+    x = numpy.asarray(x)
+    y = numpy.asarray(y)
+    if window.origin in [1,3]:
+        x = window.width - x
+    elif window.origin == 4:
+        x = window.width//2 + x
+    if window.origin in [2,3]:
+        y = window.height - y
+    elif window.origin == 4:
+        y = window.height//2 - y
+    return((x,y))
+
+#Move a coordinate in the user's coordinate system by d px, keeping relative (%) coordinates relative to size (the window's width or height)
+def shift(value,d,size):
+    if type(value) == str:
+        return(percent(float(value) + d * 100 / size))
+    return(value + d)
+
+#Write a relative coordinate as a % string, without a decimal point if it is a whole number
+def percent(value):
+    return(str(int(value)) if value == int(value) else str(value))
+
+#Draw a line like sdl2.ext.line, but clip diagonal lines pixel by pixel rather than by moving their endpoints, so a line redrawn in pieces matches one drawn whole
+def draw_line(surface,colour,x1,y1,x2,y2,width=1):
+    if x1 == x2 or y1 == y2 or width != 1 or surface.format.contents.BytesPerPixel != 4:
+        sdl2.ext.line(surface,colour,(x1,y1,x2,y2),width)
+        return
+    clip = surface.clip_rect
+    left, top, right, bottom = clip.x, clip.y, clip.x + clip.w, clip.y + clip.h
+    #Skip lines that miss the drawable area entirely
+    if max(x1,x2) < left or min(x1,x2) >= right or max(y1,y2) < top or min(y1,y2) >= bottom:
+        return
+    colour = sdl2.ext.prepare_color(colour,surface)
+    pixels = ctypes.cast(surface.pixels,ctypes.POINTER(ctypes.c_uint32))
+    pitch = surface.pitch // 4
+    #Bresenham's algorithm
+    dx = abs(x2 - x1)
+    dy = -abs(y2 - y1)
+    err = dx + dy
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    while True:
+        if left <= x1 < right and top <= y1 < bottom:
+            pixels[y1*pitch + x1] = colour
+        if x1 == x2 and y1 == y2:
+            break
+        e2 = err * 2
+        if e2 > dy:
+            err += dy
+            x1 += sx
+        if e2 < dx:
+            err += dx
+            y1 += sy
+
+#Every pixel of an (n, 4) array of diagonal (x1, y1, x2, y2) lines as an (m, 2) array of (x, y), the same pixels draw_line colours
+def line_points(segments):
+    x1, y1, x2, y2 = segments.astype(numpy.int64).T
+    dx, dy = abs(x2 - x1), abs(y2 - y1)
+    steep = dy > dx
+    major = numpy.maximum(dx,dy)
+    minor = numpy.minimum(dx,dy)
+    #Number each pixel along its line, from 0 at (x1, y1) to major at (x2, y2)
+    lengths = major + 1
+    index = numpy.repeat(numpy.arange(len(segments)),lengths)
+    step = numpy.arange(lengths.sum()) - numpy.repeat(numpy.cumsum(lengths) - lengths,lengths)
+    major, minor, steep = major[index], minor[index], steep[index]
+    #How far Bresenham's algorithm has moved along the minor axis after each step along the major axis
+    offset = (2*step*minor + major - 1) // (2*major)
+    x = x1[index] + numpy.sign(x2 - x1)[index] * numpy.where(steep,offset,step)
+    y = y1[index] + numpy.sign(y2 - y1)[index] * numpy.where(steep,step,offset)
+    return(numpy.column_stack((x,y)).astype(numpy.int32))
+
+#Pack a list or array of (x, y, w, h) areas into memory SDL can read as an array of SDL_Rects
+def rect_array(rects):
+    if has_numpy:
+        #The pointer keeps the array alive until SDL is done with it
+        return(numpy.ascontiguousarray(rects,dtype=numpy.int32).ctypes.data_as(ctypes.POINTER(sdl2.SDL_Rect)))
+    return((sdl2.SDL_Rect*len(rects))(*[sdl2.SDL_Rect(*area) for area in rects]))
+
+#Stop with a helpful message if a function needing NumPy is used without it installed
+def need_numpy():
+    if not has_numpy:
+        raise ImportError("This PyGraphica feature needs NumPy, which can be installed with 'pip install numpy'")
+
+#Turn a pair of corners in the user's coordinate system into a (xmin, ymin, xmax, ymax) hitbox in px
+def hitbox(window,x1,y1,x2,y2):
+    start = make_pos(window,(x1,y1))
+    end = make_pos(window,(x2,y2))
+    xmin,xmax = sorted((start[0],end[0]))
+    ymin,ymax = sorted((start[1],end[1]))
+    return((xmin,ymin,xmax,ymax))
+
+#Copy a surface's pixels as (bytes, PIL raw mode, bytes per row), converting them only if they aren't already 32-bit RGB
+def surface_bytes(surface):
+    if surface.format.contents.format in [sdl2.SDL_PIXELFORMAT_RGB888,sdl2.SDL_PIXELFORMAT_ARGB8888] and sys.byteorder == "little":
+        return((ctypes.string_at(surface.pixels,surface.pitch*surface.h),"BGRX",surface.pitch))
+    converted = sdl2.SDL_ConvertSurfaceFormat(surface,sdl2.SDL_PIXELFORMAT_RGBA32,0).contents
+    data = ctypes.string_at(converted.pixels,converted.pitch*converted.h)
+    pitch = converted.pitch
+    sdl2.SDL_FreeSurface(converted)
+    return((data,"RGBX",pitch))
+
+#Group or layer an object is displayed in, raising an error if it isn't being displayed
+def displayed_parent(obj):
+    parent = getattr(obj,"parent",None)
+    if parent is None:
+        raise ValueError("The object is not being displayed, it may have already been deleted.")
+    return(parent)
+
+#Make a bytearray at least size bytes long
+def grow(buffer, size):
+    if len(buffer) < size:
+        buffer.extend(bytes(size - len(buffer)))
+
+#Check whether two (xmin, ymin, xmax, ymax) areas share any pixels
+def overlaps(a,b):
+    return(a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3])
+
+#Clip (xmin, ymin, xmax, ymax) areas to the window, and combine any that overlap into their bounding box
+def merge_rects(rects,width,height):
+    merged = []
+    for r in rects:
+        r = (max(r[0],0),max(r[1],0),min(r[2],width),min(r[3],height))
+        if r[0] >= r[2] or r[1] >= r[3]:
+            continue
+        #Keep absorbing overlapping areas until the combined area doesn't overlap any others
+        i = 0
+        while i < len(merged):
+            if overlaps(merged[i],r):
+                m = merged.pop(i)
+                r = (min(m[0],r[0]),min(m[1],r[1]),max(m[2],r[2]),max(m[3],r[3]))
+                i = 0
+            else:
+                i += 1
+        merged.append(r)
+    return(merged)
+
 #Turn static or relative width into static width
 def make_height(window,height):
     if type(height) == str:
-        height = int(window.height * (float(height) / 100))
+        resolved = window.height_cache.get(height)
+        if resolved is None:
+            resolved = int(window.height * (float(height) / 100))
+            window.height_cache[height] = resolved
+        return(resolved)
     return(height)
 
 #Turn static or relative height into static height
 def make_width(window,width):
     if type(width) == str:
-        width = int(window.width * (float(width) / 100))
+        resolved = window.width_cache.get(width)
+        if resolved is None:
+            resolved = int(window.width * (float(width) / 100))
+            window.width_cache[width] = resolved
+        return(resolved)
     return(width)
 
 #Turn static or relative width into relative width
@@ -633,196 +2722,394 @@ def rela_height(window,height):
     else:
         return(str(int(100*(height/window.height))))
 
-#List of shapes to be displayed
-all_shapes = []
 
-#Loop through all key_status' and add corresponding key to a list (for easier, more python suitable access)
-def keys(caps):
-    keys = []
-    keystatus = sdl2.SDL_GetKeyboardState(None)
-    if keystatus[sdl2.SDL_SCANCODE_1]:
-        keys.append("1")
-    if keystatus[sdl2.SDL_SCANCODE_2]:
-        keys.append("2")
-    if keystatus[sdl2.SDL_SCANCODE_3]:
-        keys.append("3")
-    if keystatus[sdl2.SDL_SCANCODE_4]:
-        keys.append("4")
-    if keystatus[sdl2.SDL_SCANCODE_5]:
-        keys.append("5")
-    if keystatus[sdl2.SDL_SCANCODE_6]:
-        keys.append("6")
-    if keystatus[sdl2.SDL_SCANCODE_7]:
-        keys.append("7")
-    if keystatus[sdl2.SDL_SCANCODE_8]:
-        keys.append("8")
-    if keystatus[sdl2.SDL_SCANCODE_9]:
-        keys.append("9")
-    if keystatus[sdl2.SDL_SCANCODE_0]:
-        keys.append("0")
-    if keystatus[sdl2.SDL_SCANCODE_A]:
-        keys.append("a")
-    if keystatus[sdl2.SDL_SCANCODE_B]:
-        keys.append("b")
-    if keystatus[sdl2.SDL_SCANCODE_C]:
-        keys.append("c")
-    if keystatus[sdl2.SDL_SCANCODE_D]:
-        keys.append("d")
-    if keystatus[sdl2.SDL_SCANCODE_E]:
-        keys.append("e")
-    if keystatus[sdl2.SDL_SCANCODE_F]:
-        keys.append("f")
-    if keystatus[sdl2.SDL_SCANCODE_G]:
-        keys.append("g")
-    if keystatus[sdl2.SDL_SCANCODE_H]:
-        keys.append("h")
-    if keystatus[sdl2.SDL_SCANCODE_I]:
-        keys.append("i")
-    if keystatus[sdl2.SDL_SCANCODE_J]:
-        keys.append("j")
-    if keystatus[sdl2.SDL_SCANCODE_K]:
-        keys.append("k")
-    if keystatus[sdl2.SDL_SCANCODE_L]:
-        keys.append("l")
-    if keystatus[sdl2.SDL_SCANCODE_M]:
-        keys.append("m")
-    if keystatus[sdl2.SDL_SCANCODE_N]:
-        keys.append("n")
-    if keystatus[sdl2.SDL_SCANCODE_O]:
-        keys.append("o")
-    if keystatus[sdl2.SDL_SCANCODE_P]:
-        keys.append("p")
-    if keystatus[sdl2.SDL_SCANCODE_Q]:
-        keys.append("q")
-    if keystatus[sdl2.SDL_SCANCODE_R]:
-        keys.append("r")
-    if keystatus[sdl2.SDL_SCANCODE_S]:
-        keys.append("s")
-    if keystatus[sdl2.SDL_SCANCODE_T]:
-        keys.append("t")
-    if keystatus[sdl2.SDL_SCANCODE_U]:
-        keys.append("u")
-    if keystatus[sdl2.SDL_SCANCODE_V]:
-        keys.append("v")
-    if keystatus[sdl2.SDL_SCANCODE_W]:
-        keys.append("w")
-    if keystatus[sdl2.SDL_SCANCODE_X]:
-        keys.append("x")
-    if keystatus[sdl2.SDL_SCANCODE_Y]:
-        keys.append("y")
-    if keystatus[sdl2.SDL_SCANCODE_Z]:
-        keys.append("z")
-    if keystatus[sdl2.SDL_SCANCODE_GRAVE]:
-        keys.append("`")
-    if keystatus[sdl2.SDL_SCANCODE_MINUS]:
-        keys.append("-")
-    if keystatus[sdl2.SDL_SCANCODE_SEMICOLON]:
-        keys.append(";")
-    if keystatus[sdl2.SDL_SCANCODE_APOSTROPHE]:
-        keys.append("'")
-    if keystatus[sdl2.SDL_SCANCODE_SLASH]:
-        keys.append("/")
-    if keystatus[sdl2.SDL_SCANCODE_COMMA]:
-        keys.append(",")
-    if keystatus[sdl2.SDL_SCANCODE_PERIOD]:
-        keys.append(".")
-    if keystatus[sdl2.SDL_SCANCODE_SLASH]:
-        keys.append("?")
-    if keystatus[sdl2.SDL_SCANCODE_KP_LEFTBRACE]:
-        keys.append("[")
-    if keystatus[sdl2.SDL_SCANCODE_KP_RIGHTBRACE]:
-        keys.append("]")
-    if keystatus[sdl2.SDL_SCANCODE_BACKSLASH]:
-        keys.append("\\")
-    if keystatus[sdl2.SDL_SCANCODE_SPACE]:
-        keys.append(" ")
-
-    #Same for command keys
+#Least-recently-used store behind the module's shared caches
+class cache:
+    def __init__(self, capacity, on_evict=None):
+        #Capacity is measured in the same units as the cost given to put(), which defaults to one per item
+        self.capacity = capacity
+        self.on_evict = on_evict
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__items = collections.OrderedDict()
+
+    def __len__(self):
+        return(len(self.__items))
+
+    def __contains__(self, key):
+        return(key in self.__items)
+
+    #Return the stored value and mark it as recently used, or None if it isn't stored
+    def get(self, key):
+        item = self.__items.get(key)
+        if item is None:
+            self.misses += 1
+            return(None)
+        self.__items.move_to_end(key)
+        self.hits += 1
+        return(item[0])
+
+    def put(self, key, value, cost=1):
+        if key in self.__items:
+            self.discard(key)
+        self.__items[key] = (value, cost)
+        self.used += cost
+        self.__trim()
+
+    #Remove an entry, releasing it through on_evict
+    def discard(self, key):
+        item = self.__items.pop(key, None)
+        if item is not None:
+            self.used -= item[1]
+            if self.on_evict:
+                self.on_evict(item[0])
+
+    def resize(self, capacity):
+        self.capacity = capacity
+        self.__trim()
+
+    def clear(self):
+        while self.__items:
+            self.discard(next(iter(self.__items)))
+
+    def stats(self):
+        return({"size":len(self.__items),"used":self.used,"capacity":self.capacity,"hits":self.hits,"misses":self.misses,"evictions":self.evictions})
+
+    #Evict least recently used entries until within capacity, always keeping the newest one
+    def __trim(self):
+        while self.used > self.capacity and len(self.__items) > 1:
+            self.discard(next(iter(self.__items)))
+            self.evictions += 1
+
+#Running totals of expensive work, read by the profiler
+counters = {"fonts created":0,"text rendered":0,"glyphs rendered":0,"images loaded":0,"shapes culled":0}
+
+#Font objects shared by everything that renders text, so TTF files are parsed once rather than every frame
+font_cache = cache(32, lambda font: font.close())
+#SDL file object reading each memory mapped font, and the buffer it reads from, by path
+font_files = {}
+
+#Get a font object for a path, pixel size and colour, creating it only if it isn't cached
+def get_font(font, size, colour):
+    key = (font, size, tuple(colour))
+    ttf = font_cache.get(key)
+    if ttf is None:
+        ttf = sdl2.ext.ttf.FontTTF(font_source(font), str(size)+"px", colour)
+        counters["fonts created"] += 1
+        font_cache.put(key, ttf)
+    return(ttf)
+
+#Path of a font given by name or path, or an SDL file object reading it from memory if fonts.memory_map is on, checking the file the first time it is used
+def font_source(font):
+    path = fonts.resolve(font)
+    fonts.validate(path)
+    if not fonts.memory_map:
+        return(path)
+    source = font_files.get(path)
+    if source is None:
+        data = fonts.mapped(path)
+        buffer = (ctypes.c_char*len(data)).from_buffer(data)
+        source = (sdl2.SDL_RWFromConstMem(buffer,len(data)).contents,buffer)
+        font_files[path] = source
+    #Every size of the font shares the file object, and SDL_ttf only rewinds it after it has measured the font
+    sdl2.SDL_RWseek(source[0],0,sdl2.RW_SEEK_SET)
+    return(source[0])
+
+#Glyphs of one font, size and colour, each rendered once into a shared surface, so text that changes often is drawn by copying glyphs rather than rendering whole strings
+class glyph_atlas:
+    def __init__(self, font, size, colour):
+        self.__font = (font,size,colour)
+        ttf = self.__ttf()
+        self.line_height = sdl2.sdlttf.TTF_FontHeight(ttf)
+        self.line_skip = sdl2.sdlttf.TTF_FontLineSkip(ttf)
+        self.__ascent = sdl2.sdlttf.TTF_FontAscent(ttf)
+        self.surface = sdl2.SDL_CreateRGBSurfaceWithFormat(0,max(512,self.line_height*8),self.line_height*4,32,sdl2.SDL_PIXELFORMAT_ARGB8888).contents
+        #Area of each glyph in the surface, how far left of the pen and below the top of the line it starts, and how far it moves the pen, by character
+        self.__glyphs = {}
+        #Space added between each pair of characters by kerning
+        self.__kerning = {}
+        #Where the next glyph goes in the surface
+        self.__x = 0
+        self.__y = 0
+
+    #Where to copy each glyph of some text to, as a list of ((x, y, w, h) area in the surface, x, y), with the (width, height) of the text
+    def layout(self, content):
+        places = []
+        width = 0
+        lines = content.split("\n")
+        for number,line in enumerate(lines):
+            row = []
+            pen = 0
+            previous = None
+            for char in line:
+                area, offset, top, advance = self.__glyph(char)
+                if previous is not None:
+                    pen += self.__pair(previous,char)
+                row.append((area,pen + offset,top))
+                pen += advance
+                previous = char
+            if row:
+                #Each line starts at the left edge of its leftmost glyph, like SDL_ttf
+                left = min(x for area,x,top in row)
+                #Advances and kerning are whole pixels here but fractions in SDL_ttf, so the rounding adds up along the line
+                #The difference from the measured line is spread along it by how far each glyph is from the start, rounding only the final positions
+                line_width = measure_text(self.__font[0],self.__font[1],line)[0]
+                last = row[-1][1] - left
+                drift = line_width - (last + row[-1][0][2])
+                width = max(width,line_width)
+                places += [(area,round(x - left + (drift*(x - left)/last if last else 0)),number*self.line_skip + top) for area,x,top in row if area[3]]
+        return((places,width,self.line_skip*(len(lines)-1) + self.line_height))
+
+    def close(self):
+        free_surface(self.surface)
+
+    #Font object, fetched each time it is needed as the font cache may have closed it since
+    def __ttf(self):
+        return(ctypes.byref(get_font(*self.__font).get_ttf_font()))
+
+    #Render a character into the surface the first time it is used
+    def __glyph(self, char):
+        glyph = self.__glyphs.get(char)
+        if glyph is None:
+            rendered = get_font(*self.__font).render_text(char)
+            metrics = [ctypes.c_int(0) for i in range(5)]
+            sdl2.sdlttf.TTF_GlyphMetrics32(self.__ttf(),ord(char),*[ctypes.byref(value) for value in metrics])
+            minx, maxx, miny, maxy, advance = [value.value for value in metrics]
+            #Only the rows the glyph covers are kept, so less is copied each time it is drawn
+            top = min(max(self.__ascent - maxy,0),rendered.h)
+            bottom = max(min(self.__ascent - miny + 1,rendered.h),top)
+            area = self.__place(rendered.w,bottom - top)
+            sdl2.SDL_SetSurfaceBlendMode(rendered,sdl2.SDL_BLENDMODE_NONE)
+            sdl2.SDL_BlitSurface(rendered,sdl2.SDL_Rect(0,top,rendered.w,bottom - top),self.surface,sdl2.SDL_Rect(*area))
+            sdl2.SDL_FreeSurface(rendered)
+            #Renderers must upload the surface again to see the new glyph
+            for backend in renderers:
+                backend.forget(self.surface)
+            counters["glyphs rendered"] += 1
+            glyph = (area,min(minx,0),top,advance)
+            self.__glyphs[char] = glyph
+        return(glyph)
+
+    #How much closer (or further apart) two characters are drawn than their advances alone would put them
+    def __pair(self, first, second):
+        kerning = self.__kerning.get(first+second)
+        if kerning is None:
+            #Measuring the pair includes kerning from every table SDL_ttf uses, not only the ones its kerning functions read
+            width = measure_text(self.__font[0],self.__font[1],first+second)[0]
+            area, offset, top, advance = self.__glyph(first)
+            second_area, second_offset, second_top, second_advance = self.__glyph(second)
+            kerning = width + offset - advance - (second_area[2] + second_offset)
+            self.__kerning[first+second] = kerning
+        return(kerning)
+
+    #Find space for a w by h glyph, filling rows left to right and doubling the surface's height when it is full
+    def __place(self, w, h):
+        if self.__x + w > self.surface.w:
+            self.__x = 0
+            self.__y += self.line_height
+        if self.__y + h > self.surface.h:
+            bigger = sdl2.SDL_CreateRGBSurfaceWithFormat(0,self.surface.w,self.surface.h*2,32,sdl2.SDL_PIXELFORMAT_ARGB8888).contents
+            sdl2.SDL_SetSurfaceBlendMode(self.surface,sdl2.SDL_BLENDMODE_NONE)
+            sdl2.SDL_BlitSurface(self.surface,None,bigger,None)
+            free_surface(self.surface)
+            self.surface = bigger
+        area = (self.__x,self.__y,w,h)
+        self.__x += w
+        return(area)
+
+#Sizes of measured strings by font, px size and content
+metrics_cache = cache(4096)
+
+#Glyph atlases by font, px size and colour
+glyph_cache = cache(32, lambda atlas: atlas.close())
+
+#Get the glyph atlas for a font, pixel size and colour, making it if it isn't cached
+def get_glyphs(font, size, colour):
+    key = (font, size, tuple(colour))
+    atlas = glyph_cache.get(key)
+    if atlas is None:
+        atlas = glyph_atlas(font, size, colour)
+        glyph_cache.put(key, atlas)
+    return(atlas)
+
+#Release the pixel memory of a surface that is no longer used
+def free_surface(surface):
+    for backend in renderers:
+        backend.forget(surface)
+    sdl2.SDL_FreeSurface(surface)
+
+#Decoded and scaled images shared between image objects, capped at 64MB of pixel data by default
+image_cache = cache(64*1024*1024, free_surface)
+#Pixel size of each image file, read once per path
+image_sizes = {}
+
+#Get the size of an image file without decoding its pixels
+def image_size(path):
+    size = image_sizes.get(path)
+    if size is None:
+        with Image.open(path) as img:
+            size = img.size
+        image_sizes[path] = size
+    return(size)
+
+#Get an image file, given by its absolute path, decoded and scaled to the given size, as an in-memory surface
+def scaled_image(path,width,height):
+    surface = image_cache.get((path,width,height))
+    if surface is None:
+        surface = cache_image(path,*decode_image(path,width,height))
+    return(surface)
+
+#Decode an image file, scaled to width by height or left at its own size if width is None, as (PIL image, whether it is opaque); this doesn't use SDL, so it can run on a loader thread
+def decode_image(path,width=None,height=None):
+    with Image.open(path) as img:
+        opaque = img.mode not in ["RGBA","LA","PA"] and "transparency" not in img.info
+        img = img.convert("RGB" if opaque else "RGBA")
+    if width is not None:
+        img = img.resize((width,height))
+    return((img,opaque))
+
+#Turn a decoded image into a surface and keep it in the image cache, which must happen on the main thread
+def cache_image(path,img,opaque):
+    surface = pillow_surface(img,opaque)
+    counters["images loaded"] += 1
+    image_cache.put((os.path.abspath(path),img.width,img.height),surface,img.width*img.height*4)
+    return(surface)
+
+#Turn a PIL image into an SDL surface
+def pillow_surface(img,opaque):
+    surface = sdl2.ext.pillow_to_surface(img)
+    #Images without transparency can be copied straight to the window rather than blended
+    if opaque:
+        sdl2.SDL_SetSurfaceBlendMode(surface,sdl2.SDL_BLENDMODE_NONE)
+    return(surface)
+
+#Positions for areas of the given (w, h) sizes packed tallest first into rows no wider than width (or the widest area), as (list of (x, y), total width, total height)
+def pack_sizes(sizes,width=4096):
+    width = max([width]+[w for w,h in sizes])
+    positions = [None]*len(sizes)
+    x = y = row = used = 0
+    for index in sorted(range(len(sizes)),key=lambda index:-sizes[index][1]):
+        w, h = sizes[index]
+        if x + w > width:
+            x = 0
+            y += row
+            row = 0
+        positions[index] = (x,y)
+        x += w
+        row = max(row,h)
+        used = max(used,x)
+    return((positions,max(used,1),max(y + row,1)))
+
+#Start decoding an image on the loader threads, unless it is already cached or loading; progress is a preload() tracker to count it towards
+def load_image(path,width=None,height=None,progress=None):
+    global image_loader
+    #Images loaded at their own size are cached under that size, so drawing them finds the same entry
+    if width is None:
+        width, height = image_size(path)
+    key = (os.path.abspath(path),width,height)
+    if key in image_cache:
+        if progress:
+            progress.finish()
+        return
+    if key not in loading:
+        if image_loader is None:
+            image_loader = futures.ThreadPoolExecutor(max_workers=4,thread_name_prefix="PyGraphica")
+        loading[key] = (image_loader.submit(decode_image,path,width,height),[])
+    if progress:
+        loading[key][1].append(progress)
+
+#Turn images that have finished loading into surfaces, called by window.update() on the main thread
+def finish_loading():
+    for key in [key for key in loading if loading[key][0].done()]:
+        future, trackers = loading.pop(key)
+        #Errors opening the file are raised here, as they would have been when the image was made
+        cache_image(key[0],*future.result())
+        for tracker in trackers:
+            tracker.finish()
+
+#Numbers telling atlases apart in the image cache
+atlas_keys = itertools.count()
+
+#Thread pool decoding images in the background, made the first time one is loaded asynchronously
+image_loader = None
+#Images being decoded in the background, as (future, preload() trackers waiting for it) by image cache key
+loading = {}
+
+#Renderer backends whose textures must be destroyed along with the surfaces they were made from
+renderers = []
+
+#Rendered strings shared between text objects, only used after share_text() is called
+text_cache = cache(512, free_surface)
+shared_text = False
+
+#Names of the character keys and command keys, by scancode, filled in by load_key_names() when the first window is made
+key_names = {}
+comm_names = {}
+
+#Fill in the key names from SDL's scancodes, which imports SDL
+def load_key_names():
+    if key_names:
+        return
+    key_names.update({getattr(sdl2,"SDL_SCANCODE_"+key.upper()):key for key in "1234567890abcdefghijklmnopqrstuvwxyz"})
+    key_names.update({
+        sdl2.SDL_SCANCODE_GRAVE:"`",
+        sdl2.SDL_SCANCODE_MINUS:"-",
+        sdl2.SDL_SCANCODE_EQUALS:"=",
+        sdl2.SDL_SCANCODE_SEMICOLON:";",
+        sdl2.SDL_SCANCODE_APOSTROPHE:"'",
+        sdl2.SDL_SCANCODE_SLASH:"/",
+        sdl2.SDL_SCANCODE_COMMA:",",
+        sdl2.SDL_SCANCODE_PERIOD:".",
+        sdl2.SDL_SCANCODE_LEFTBRACKET:"[",
+        sdl2.SDL_SCANCODE_RIGHTBRACKET:"]",
+        sdl2.SDL_SCANCODE_BACKSLASH:"\\",
+        sdl2.SDL_SCANCODE_SPACE:" ",
+    })
+    comm_names.update({getattr(sdl2,"SDL_SCANCODE_F"+str(n)):"F"+str(n) for n in range(1,25)})
+    comm_names.update({
+        sdl2.SDL_SCANCODE_CAPSLOCK:"CAPS",
+        sdl2.SDL_SCANCODE_RETURN:"ENTER",
+        sdl2.SDL_SCANCODE_KP_ENTER:"ENTER",
+        sdl2.SDL_SCANCODE_LSHIFT:"SHIFT",
+        sdl2.SDL_SCANCODE_RSHIFT:"SHIFT",
+        sdl2.SDL_SCANCODE_LCTRL:"CTRL",
+        sdl2.SDL_SCANCODE_RCTRL:"CTRL",
+        sdl2.SDL_SCANCODE_ESCAPE:"ESCAPE",
+        sdl2.SDL_SCANCODE_DELETE:"DEL",
+        sdl2.SDL_SCANCODE_TAB:"TAB",
+        sdl2.SDL_SCANCODE_LALT:"ALT",
+        sdl2.SDL_SCANCODE_RALT:"ALT",
+        sdl2.SDL_SCANCODE_LEFT:"LEFT",
+        sdl2.SDL_SCANCODE_RIGHT:"RIGHT",
+        sdl2.SDL_SCANCODE_UP:"UP",
+        sdl2.SDL_SCANCODE_DOWN:"DOWN",
+        sdl2.SDL_SCANCODE_BACKSPACE:"BACKSPACE",
+        sdl2.SDL_SCANCODE_HOME:"HOME",
+        sdl2.SDL_SCANCODE_END:"END",
+        sdl2.SDL_SCANCODE_PAGEUP:"PAGEUP",
+        sdl2.SDL_SCANCODE_PAGEDOWN:"PAGEDOWN",
+    })
+
+#Turn a collection of held scancodes into lists of key and command names, capitalising keys if caps is on or shift is held
+def held_keys(held, caps):
+    keys = [key_names[code] for code in held if code in key_names]
     comms = []
-    if keystatus[sdl2.SDL_SCANCODE_CAPSLOCK]:
-        comms.append("CAPS")
-    if keystatus[sdl2.SDL_SCANCODE_KP_ENTER]:
-        comms.append("ENTER")
-    if keystatus[sdl2.SDL_SCANCODE_LSHIFT] or keystatus[sdl2.SDL_SCANCODE_RSHIFT]:
-        comms.append("SHIFT")
-    if keystatus[sdl2.SDL_SCANCODE_LCTRL] or keystatus[sdl2.SDL_SCANCODE_RCTRL]:
-        comms.append("CTRL")
-    if keystatus[sdl2.SDL_SCANCODE_ESCAPE]:
-        comms.append("ESCAPE")
-    if keystatus[sdl2.SDL_SCANCODE_F1]:
-        comms.append("F1")
-    if keystatus[sdl2.SDL_SCANCODE_F2]:
-        comms.append("F2")
-    if keystatus[sdl2.SDL_SCANCODE_F3]:
-        comms.append("F3")
-    if keystatus[sdl2.SDL_SCANCODE_F4]:
-        comms.append("F4")
-    if keystatus[sdl2.SDL_SCANCODE_F5]:
-        comms.append("F5")
-    if keystatus[sdl2.SDL_SCANCODE_F6]:
-        comms.append("F6")
-    if keystatus[sdl2.SDL_SCANCODE_F7]:
-        comms.append("F7")
-    if keystatus[sdl2.SDL_SCANCODE_F8]:
-        comms.append("F8")
-    if keystatus[sdl2.SDL_SCANCODE_F9]:
-        comms.append("F9")
-    if keystatus[sdl2.SDL_SCANCODE_F10]:
-        comms.append("F10")
-    if keystatus[sdl2.SDL_SCANCODE_F11]:
-        comms.append("F11")
-    if keystatus[sdl2.SDL_SCANCODE_F12]:
-        comms.append("F12")
-    if keystatus[sdl2.SDL_SCANCODE_F13]:
-        comms.append("F13")
-    if keystatus[sdl2.SDL_SCANCODE_F14]:
-        comms.append("F14")
-    if keystatus[sdl2.SDL_SCANCODE_F15]:
-        comms.append("F15")
-    if keystatus[sdl2.SDL_SCANCODE_F16]:
-        comms.append("F16")
-    if keystatus[sdl2.SDL_SCANCODE_F17]:
-        comms.append("F17")
-    if keystatus[sdl2.SDL_SCANCODE_F18]:
-        comms.append("F18")
-    if keystatus[sdl2.SDL_SCANCODE_F19]:
-        comms.append("F19")
-    if keystatus[sdl2.SDL_SCANCODE_F20]:
-        comms.append("F20")
-    if keystatus[sdl2.SDL_SCANCODE_F21]:
-        comms.append("F21")
-    if keystatus[sdl2.SDL_SCANCODE_F22]:
-        comms.append("F22")
-    if keystatus[sdl2.SDL_SCANCODE_F23]:
-        comms.append("F23")
-    if keystatus[sdl2.SDL_SCANCODE_F24]:
-        comms.append("F24")
-    if keystatus[sdl2.SDL_SCANCODE_DELETE]:
-        comms.append("DEL")
-    if keystatus[sdl2.SDL_SCANCODE_TAB]:
-        comms.append("TAB")
-    if keystatus[sdl2.SDL_SCANCODE_LALT] or keystatus[sdl2.SDL_SCANCODE_RALT]:
-        comms.append("ALT")
-    if keystatus[sdl2.SDL_SCANCODE_LEFT]:
-        comms.append("LEFT")
-    if keystatus[sdl2.SDL_SCANCODE_RIGHT]:
-        comms.append("RIGHT")
-    if keystatus[sdl2.SDL_SCANCODE_UP]:
-        comms.append("UP")
-    if keystatus[sdl2.SDL_SCANCODE_DOWN]:
-        comms.append("DOWN")
-    if keystatus[sdl2.SDL_SCANCODE_BACKSPACE]:
-        comms.append("BACKSPACE")
-
-    #If caps key down add capital equivalent of key
+    for code in held:
+        comm = comm_names.get(code)
+        if comm and comm not in comms:
+            comms.append(comm)
     if caps or "SHIFT" in comms:
-        upper = []
-        for key in keys:
-            upper.append(uppercase[key])
-        keys = upper
-
+        keys = [uppercase[key] for key in keys]
     return((keys,comms))
 
+#Read the whole keyboard state into lists of held keys and command keys
+def keys(caps):
+    keystatus = sdl2.SDL_GetKeyboardState(None)
+    held = [code for code in list(key_names) + list(comm_names) if keystatus[code]]
+    return(held_keys(held, caps))
+
 #Capital equivalents
 uppercase = {
     "a":"A","b":"B","c":"C","d":"D","e":"E","f":"F","g":"G","h":"H","i":"I","j":"J","k":"K","l":"L","m":"M","n":"N","o":"O","p":"P","q":"Q","r":"R","s":"S","t":"T","u":"U","v":"V","w":"W","x":"X","y":"Y","z":"Z",
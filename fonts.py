@@ -1,27 +1,67 @@
 import os
-import sys
+import mmap
 
-root = os.path.join(os.path.join(sys.executable,".."),"Lib/site-packages/PyGraphica")
+#Folder PyGraphica is installed in, which the bundled fonts are kept in
+root = os.path.dirname(os.path.abspath(__file__))
 
-Arial = os.path.join(root,"arial.ttf")
+#Paths of the fonts that can be used by name, such as "Arial"
+registry = {}
+#If memory_map is True, each font file is mapped into memory once and shared by every size and colour of the font, rather than opened again for each one
+memory_map = True
+#Fonts that have already been checked, and the memory map of each font file by path
+checked = set()
+maps = {}
+
+#Add a font to the registry so it can be used by name, returning its path
+def register(name, path):
+    registry[name] = path
+    return(path)
+
+#Path of a font given by name or path
+def resolve(font):
+    return(registry.get(font,font))
+
+#Raise an error if a font file is missing or isn't a TrueType or OpenType font, reading each file only the first time it is used
+def validate(path):
+    if path in checked:
+        return
+    if not os.path.isfile(path):
+        raise FileNotFoundError("Font file '" + path + "' could not be found.")
+    with open(path,"rb") as file:
+        signature = file.read(4)
+    if signature not in [b"\x00\x01\x00\x00",b"OTTO",b"true",b"ttcf"]:
+        raise ValueError("'" + path + "' is not a TrueType or OpenType font.")
+    checked.add(path)
+
+#Read-only view of a font file's bytes, mapped into memory the first time it is used
+def mapped(path):
+    data = maps.get(path)
+    if data is None:
+        with open(path,"rb") as file:
+            #Copy on write, so the map can be handed to SDL as a buffer without the file ever being changed
+            data = mmap.mmap(file.fileno(),0,access=mmap.ACCESS_COPY)
+        maps[path] = data
+    return(data)
+
+Arial = register("Arial",os.path.join(root,"arial.ttf"))
 #Arial font is owned by Monotype imaging
-Baskerville = os.path.join(root,"baskerville.ttf")
+Baskerville = register("Baskerville",os.path.join(root,"baskerville.ttf"))
 #Baskerville font was designed by JohnBaskerville in the 1750s
-BrushScript = os.path.join(root,"brushscript.otf")
+BrushScript = register("BrushScript",os.path.join(root,"brushscript.ttf"))
 #BrushScript font is owned by Adobe Originals
-Calibri = os.path.join(root,"calibri.ttf")
+Calibri = register("Calibri",os.path.join(root,"calibri.ttf"))
 #Calibri is owned by Microsoft
-Courier = os.path.join(root,"courier.ttf")
+Courier = register("Courier",os.path.join(root,"courier.ttf"))
 #Courier is owned  by IBM
-Garamond = os.path.join(root,"garamond.ttf")
+Garamond = register("Garamond",os.path.join(root,"garamond.ttf"))
 #Garamond is owned by Monotype imaging
-Helvetica  = os.path.join(root,"helvetica.ttf")
+Helvetica  = register("Helvetica",os.path.join(root,"helvetica.ttf"))
 #Helvetica is owned by Monotype imaging
-Impact = os.path.join(root,"impact.ttf")
+Impact = register("Impact",os.path.join(root,"impact.ttf"))
 #Impact is owned by Monotype imaging
-OpenDyslexic = os.path.join(root,"opendyslexic.otf")
+OpenDyslexic = register("OpenDyslexic",os.path.join(root,"opendyslexic.ttf"))
 #OpenDyslexic is owned by Abelardo Gonzales
-TimesNewRoman= os.path.join(root,"timesnewroman.ttf")
+TimesNewRoman= register("TimesNewRoman",os.path.join(root,"timesnewroman.ttf"))
 #TimesNewRoman is owned by Monotype Imagine
-Trebuchet = os.path.join(root,"timesnewroman.ttf")
+Trebuchet = register("Trebuchet",os.path.join(root,"trebuchet.ttf"))
 #Trebuchet is owned by Microsoft
@@ -0,0 +1,703 @@
+import os
+
+#Draw without a display
+os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+
+import json
+import numpy
+import pytest
+import random
+import tempfile
+import threading
+import time
+from PyGraphica import draw, colours, fonts
+
+#The bundled Arial font, found next to draw.py rather than where the fonts file expects PyGraphica to be installed
+arial = os.path.join(os.path.dirname(os.path.abspath(draw.__file__)),"arial.ttf")
+
+def test_font_cache_shared_between_text():
+    window = draw.window("test",(400,300))
+    first = draw.text(window,10,10,20,colours.WHITE,"First",arial)
+    second = draw.text(window,10,40,20,colours.WHITE,"Second",arial)
+    window.update()
+    before = draw.font_cache.stats()
+    second.content = "Changed"
+    window.update()
+    window.update()
+    after = draw.font_cache.stats()
+    #The font is only opened once, however many frames or strings are drawn with it
+    assert after["misses"] == before["misses"]
+    assert after["hits"] > before["hits"]
+
+def test_shared_text_cache_hits_and_evictions():
+    window = draw.window("test",(400,300))
+    draw.share_text()
+    release = draw.text_cache.on_evict
+    try:
+        window.update()
+        before = draw.text_cache.stats()
+        labels = [draw.text(window,10,20*i,20,colours.WHITE,"Shared label",arial) for i in range(3)]
+        window.update()
+        window.update()
+        stats = draw.text_cache.stats()
+        #Identical labels share one surface, which is rendered once
+        assert stats["misses"] - before["misses"] == 1
+        assert stats["hits"] - before["hits"] >= 5
+        #Strings pushed out of the cache are freed, and rendered again when needed
+        freed = []
+        draw.text_cache.on_evict = lambda surface: (freed.append(surface), release(surface))
+        draw.text_cache.resize(1)
+        labels[0].content = "Other label"
+        window.update()
+        assert draw.text_cache.stats()["evictions"] > stats["evictions"]
+        assert freed and len(draw.text_cache) == 1
+    finally:
+        draw.text_cache.on_evict = release
+        draw.text_cache.resize(512)
+        draw.share_text(False)
+
+def test_profiler_phases_and_counts():
+    window = draw.window("test",(400,300),profile=True)
+    label = draw.text(window,10,10,20,colours.WHITE,"Before",arial)
+    draw.rect(window,10,50,60,90,colours.RED)
+    window.update()
+    frames = []
+    window.profiler.on_frame(lambda profiler: frames.append(dict(profiler.counts)))
+    label.content = "After"
+    window.update()
+    window.update()
+    assert {"mouse","fill","rect","text","refresh","keys","wait"} <= set(window.profiler.phases)
+    assert all(seconds >= 0 for seconds in window.profiler.phases.values())
+    #Text is only rendered in the frame after its content changes
+    assert [counts["text rendered"] for counts in frames] == [1,0]
+    stats = window.profiler.stats()
+    assert stats["frames"] == 3
+    assert stats["counts"]["text rendered"] == window.profiler.total_counts["text rendered"]/3
+
+def test_headless_frame_and_save():
+    window = draw.window("test",(60,40),colour=colours.BLUE,headless=True)
+    draw.rect(window,10,10,30,20,colours.RED)
+    window.update()
+    pixels = window.frame()
+    assert pixels.shape == (40,60,3) and pixels.dtype == numpy.uint8
+    assert tuple(pixels[0,0]) == colours.BLUE
+    assert tuple(pixels[15,20]) == colours.RED
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,"frame.png")
+        window.save(path)
+        with draw.Image.open(path) as saved:
+            assert (numpy.asarray(saved.convert("RGB")) == pixels).all()
+
+#Pixels of a line from (x1, y1) to (x2, y2) by Bresenham's algorithm, including both ends
+def bresenham(x1, y1, x2, y2):
+    pixels = set()
+    dx, dy = abs(x2 - x1), -abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx + dy
+    while True:
+        pixels.add((x1,y1))
+        if (x1,y1) == (x2,y2):
+            return(pixels)
+        e2 = err*2
+        if e2 > dy:
+            err += dy
+            x1 += sx
+        if e2 < dx:
+            err += dx
+            y1 += sy
+
+def lit_pixels(window):
+    ys, xs = numpy.nonzero(window.frame().any(axis=2))
+    return(set(zip(xs.tolist(),ys.tolist())))
+
+def test_lines_match_bresenham():
+    points = numpy.array([[5,5],[90,22],[41,75],[12,60],[12,12],[70,12],[3,70]])
+    window = draw.window("test",(100,80),headless=True)
+    polyline = draw.lines(window,points,colours.WHITE)
+    window.update()
+    expected = set()
+    for (x1,y1),(x2,y2) in zip(points[:-1].tolist(),points[1:].tolist()):
+        expected |= bresenham(x1,y1,x2,y2)
+    assert lit_pixels(window) == expected
+    assert (polyline.x1,polyline.y1,polyline.x2,polyline.y2) == (3,5,90,75)
+    #Separate segments, given as (x1, y1, x2, y2), draw the same pixels
+    window = draw.window("test",(100,80),headless=True)
+    separate = draw.lines(window,numpy.column_stack((points[:-1],points[1:])),colours.WHITE)
+    window.update()
+    assert lit_pixels(window) == expected
+    assert (separate.segments() == numpy.column_stack((points[:-1],points[1:]))).all()
+
+def test_rect_batch_matches_rects():
+    batch_window = draw.window("test",(100,80),headless=True)
+    batch = draw.rect_batch(batch_window,4,colours.RED)
+    batch.x[:] = [5,20,50,70]
+    batch.y[:] = [5,30,10,60]
+    batch.width[:] = [10,25,8,20]
+    batch.height[:] = [10,15,30,5]
+    batch.colour[2] = colours.GREEN
+    batch.shown[3] = False
+    rect_window = draw.window("test",(100,80),headless=True)
+    for i in range(3):
+        draw.rect(rect_window,int(batch.x[i]),int(batch.y[i]),int(batch.x[i] + batch.width[i]),int(batch.y[i] + batch.height[i]),tuple(batch.colour[i].tolist()))
+    batch_window.update()
+    rect_window.update()
+    assert (batch_window.frame() == rect_window.frame()).all()
+    assert tuple(batch_window.frame()[10,10]) == colours.RED
+    assert tuple(batch_window.frame()[20,52]) == colours.GREEN
+    #Hidden rectangles are left out of the corners used by collision()
+    assert (batch.x1,batch.y1,batch.x2,batch.y2) == (5,5,58,45)
+    batch_window.mouse_x, batch_window.mouse_y = 30, 40
+    batch.update()
+    assert batch.hover.tolist() == [False,True,False,False]
+
+def test_sprite_play_steps_through_frames():
+    window = draw.window("test",(60,40),headless=True)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,"sheet.png")
+        sheet = draw.Image.new("RGB",(30,10))
+        for i, colour in enumerate((colours.RED,colours.GREEN,colours.BLUE)):
+            sheet.paste(colour,(i*10,0,i*10 + 10,10))
+        sheet.save(path)
+        walk = draw.sprite_sheet(path,10,10,names=["red","green","blue"])
+        player = draw.sprite(window,walk,5,5,"red",width=20)
+        #Frames move on by the time between updates, so set it rather than waiting
+        player.play(["green","blue"],4)
+        steps = []
+        for i in range(5):
+            window.delta = 0.125
+            player.update()
+            steps.append(player.frame)
+        assert steps == ["green","blue","blue","green","green"]
+        player.play([0,1,2],4,loop=False)
+        window.delta = 1
+        player.update()
+        assert player.frame == 2 and not player.playing
+        #Every frame is scaled like the first
+        window.update()
+        assert (player.x2,player.y2) == (25,25)
+        assert tuple(window.frame()[6,6]) == colours.BLUE
+        assert tuple(window.frame()[24,24]) == colours.BLUE
+        assert tuple(window.frame()[26,26]) == colours.BLACK
+
+def test_benchmark_compares_with_baseline(capsys):
+    from PyGraphica import benchmark
+    with tempfile.TemporaryDirectory() as folder:
+        baseline = os.path.join(folder,"baseline.json")
+        output = os.path.join(folder,"results.json")
+        #A baseline far faster for one result and far slower for another, and one without a result to compare
+        with open(baseline,"w") as file:
+            json.dump({"results":{"rect frame":1e-12,"collision":1000,"removed":1}},file)
+        status = benchmark.main(["--count","5","--frames","2","--no-imports","--threshold","0.5","--baseline",baseline,"--output",output])
+        assert status == 1
+        printed = {line[:20].strip():line for line in capsys.readouterr().out.splitlines()}
+        assert printed["rect frame"].endswith("SLOWER")
+        assert "%" in printed["collision"] and not printed["collision"].endswith("SLOWER")
+        assert "%" not in printed["line frame"] and "removed" not in printed
+        with open(output) as file:
+            saved = json.load(file)
+        assert saved["count"] == 5 and saved["frames"] == 2
+        assert {"rect frame","image frame","collision","to_front"} <= set(saved["results"])
+        assert all(seconds > 0 for seconds in saved["results"].values())
+
+def make_image(folder):
+    path = os.path.join(folder,"test.png")
+    draw.Image.new("RGB",(20,10),colours.GREEN).save(path)
+    return(path)
+
+def test_move_relative_text_and_image():
+    window = draw.window(headless=True)
+    with tempfile.TemporaryDirectory() as folder:
+        label = draw.text(window,"10","10","5",colours.WHITE,"Hello",fonts.Arial)
+        picture = draw.image(window,make_image(folder),"20","20","10")
+        field = draw.textbox(window,"30","30","5","20",fonts.Arial)
+        window.update()
+        for obj in (label,picture,field):
+            obj.move(5,3)
+        window.update()
+        assert label.x1 == "10.625" and picture.x1 == "20.625"
+        assert float(label.x2) > 10.625 and float(picture.x2) > 20.625
+        #Resizing works out every endpoint again
+        window.resize(640,480)
+        window.update()
+
+def test_move_group_of_relative_objects():
+    window = draw.window(headless=True)
+    menu = window.scene.group("menu")
+    label = draw.text(window,"10","10","5",colours.WHITE,"Hello",fonts.Arial)
+    menu.add(label)
+    window.update()
+    menu.move(3,3)
+    window.update()
+    assert label.x1 == "10.375"
+
+def push_keys(*keys):
+    for key in keys:
+        event = draw.sdl2.SDL_Event()
+        event.type = draw.sdl2.SDL_KEYDOWN
+        event.key.keysym.scancode = getattr(draw.sdl2,"SDL_SCANCODE_"+key)
+        draw.sdl2.SDL_PushEvent(event)
+
+def press(window, *keys):
+    push_keys(*keys)
+    #Keys are read at the end of one update and used in the next
+    window.update()
+    window.update()
+
+def test_textarea_lines_shortened_by_caller():
+    window = draw.window(headless=True)
+    area = draw.textarea(window,10,10,300,200,16,fonts.Arial,"\n".join(str(i) for i in range(50)))
+    area.focused = True
+    area.cursor_line = 45
+    area.cursor_column = 2
+    window.update()
+    del area.lines[:40]
+    press(window,"BACKSPACE","UP")
+    assert area.lines[9] == "4"
+    assert (area.cursor_line,area.cursor_column) == (8,1)
+
+def test_textarea_empty_lines():
+    window = draw.window(headless=True)
+    area = draw.textarea(window,10,10,300,200,16,fonts.Arial,"text")
+    area.lines.clear()
+    window.update()
+    assert area.lines == [""]
+    area.lines = []
+    area.append("log line")
+    assert area.lines == ["log line"]
+    #A new click inside the box places the cursor
+    area.lines = []
+    window.mouse_x, window.mouse_y = 50, 50
+    window.mouse_down, window.mouse_held = True, False
+    area.update()
+    assert area.focused and area.lines == [""]
+    assert (area.cursor_line,area.cursor_column) == (0,0)
+
+def test_dirty_rects_redraw_when_exposed():
+    window = draw.window(dirty_rects=True)
+    draw.rect(window,10,10,50,50,colours.RED)
+    window.update()
+    window.update()
+    #Something covering the window leaves garbage behind, which a static scene wouldn't repaint
+    draw.sdl2.ext.fill(window.surface,colours.GREEN)
+    window.update()
+    assert tuple(window.frame()[5,5]) == colours.GREEN
+    for kind in ("EXPOSED","RESTORED"):
+        draw.sdl2.ext.fill(window.surface,colours.GREEN)
+        event = draw.sdl2.SDL_Event()
+        event.type = draw.sdl2.SDL_WINDOWEVENT
+        event.window.event = getattr(draw.sdl2,"SDL_WINDOWEVENT_"+kind)
+        draw.sdl2.SDL_PushEvent(event)
+        #Events are read at the end of one update and acted on in the next
+        window.update()
+        window.update()
+        assert tuple(window.frame()[5,5]) == colours.BLACK
+        assert tuple(window.frame()[30,30]) == colours.RED
+
+def test_glyph_text_matches_rendered_width():
+    window = draw.window(headless=True)
+    for size in (12,16,24,40):
+        for content in ("AVATAR Wave","To, Yo\nWAVE AV"):
+            rendered = draw.text(window,10,10,size,colours.WHITE,content,fonts.Calibri)
+            glyphs = draw.text(window,10,10,size,colours.WHITE,content,fonts.Calibri,glyphs=True)
+            window.update()
+            assert (glyphs.width,glyphs.height) == (rendered.width,rendered.height)
+
+def test_key_changes_lists_each_key_once():
+    window = draw.window(headless=True)
+    push_keys("A","B","A")
+    window.update()
+    assert window.key_changes == ["a","b"]
+    assert [key for kind,key in window.key_events] == ["a","b","a"]
+
+#Update the window until loaded() is true, giving the image loader threads time to finish
+def update_until(window, loaded, frames=500):
+    for frame in range(frames):
+        window.update()
+        if loaded():
+            return
+        time.sleep(0.01)
+    raise AssertionError("Not loaded after "+str(frames)+" frames")
+
+def test_async_image_notified_after_loading_while_resizing():
+    window = draw.window(headless=True)
+    with tempfile.TemporaryDirectory() as folder:
+        path = make_image(folder)
+        window.resize(640,480)
+        calls = []
+        picture = draw.image(window,path,10,10,30,asynchronous=True)
+        picture.on_loaded = lambda picture: calls.append(picture.loaded)
+        window.update()
+        #Images don't start loading until the window stops changing size
+        assert window.resizing and not picture.loaded and calls == []
+        window.resize_delay = 0
+        update_until(window,lambda: calls)
+        window.update()
+        assert calls == [True]
+
+def test_preload_at_own_size_is_cached():
+    window = draw.window(headless=True)
+    with tempfile.TemporaryDirectory() as folder:
+        path = make_image(folder)
+        progress = []
+        tracker = draw.preload([path],lambda done,total: progress.append((done,total)))
+        update_until(window,tracker.finished)
+        assert progress == [(1,1)]
+        loaded = draw.counters["images loaded"]
+        #Preloading again, or drawing the image at its own size, doesn't decode the file again
+        assert draw.preload([path]).finished()
+        draw.image(window,path,0,0,10,20)
+        window.update()
+        assert draw.counters["images loaded"] == loaded and not draw.loading
+        assert tuple(window.frame()[5,5]) == colours.GREEN
+
+def test_async_image_placeholder():
+    window = draw.window(headless=True)
+    with tempfile.TemporaryDirectory() as folder:
+        path = make_image(folder)
+        calls = []
+        picture = draw.image(window,path,10,10,20,asynchronous=True,placeholder=colours.RED)
+        picture.on_loaded = lambda picture: calls.append(picture.loaded)
+        window.update()
+        #The placeholder fills the image's area until the file has been decoded
+        assert not picture.loaded and calls == []
+        assert tuple(window.frame()[15,15]) == colours.RED
+        update_until(window,lambda: picture.loaded)
+        window.update()
+        assert tuple(window.frame()[15,15]) == colours.GREEN
+        assert tuple(window.frame()[15,55]) == colours.BLACK
+        window.update()
+        assert calls == [True]
+
+def test_measure_text_matches_render_text():
+    for font in (fonts.Arial,fonts.Calibri,fonts.TimesNewRoman):
+        for size in (9,16,33):
+            for content in ("Hello","AVATAR Wave","gjpqy ","Two\nlines","\n\nGap"):
+                surface = draw.get_font(font,size,colours.WHITE).render_text(content)
+                assert draw.measure_text(font,size,content) == (surface.w,surface.h)
+
+def test_empty_text_is_one_line_high():
+    window = draw.window(headless=True)
+    label = draw.text(window,10,10,20,colours.WHITE,"Some words",fonts.Arial)
+    window.update()
+    empty = draw.measure_text(fonts.Arial,20,"")
+    assert empty[0] == 0 and empty[1] == draw.measure_text(fonts.Arial,20,"Some words")[1]
+    label.content = ""
+    window.update()
+    assert (label.width,label.height) == empty
+    assert (label.x2,label.y2) == (10,10 + empty[1])
+    assert label.bounds() == (10,10,10,10 + empty[1])
+
+def test_image_cache_frees_evicted_surfaces():
+    assert draw.image_cache.capacity == 64*1024*1024
+    window = draw.window(headless=True)
+    draw.image_cache.clear()
+    freed = []
+    release = draw.image_cache.on_evict
+    draw.image_cache.on_evict = lambda surface: (freed.append((surface.w,surface.h)), release(surface))
+    #Room for the 40x20 and 60x30 copies, but not the 80x40 one as well
+    draw.image_cache.resize(16000)
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            picture = draw.image(window,make_image(folder),0,0,20)
+            loaded = draw.counters["images loaded"]
+            for height in (20,30,40,20):
+                picture.height = height
+                window.update()
+                assert draw.image_cache.used <= draw.image_cache.capacity
+            assert freed == [(40,20),(60,30)]
+            #Evicted sizes are decoded again when they are next drawn
+            assert draw.counters["images loaded"] - loaded == 4
+            assert tuple(window.frame()[10,30]) == colours.GREEN
+            #A new path, such as a relative one, is used for the cache key from the next frame
+            picture.path = os.path.relpath(picture.path)
+            window.update()
+            assert draw.counters["images loaded"] - loaded == 4
+    finally:
+        draw.image_cache.on_evict = release
+        draw.image_cache.resize(64*1024*1024)
+
+class box:
+    def __init__(self, x1, y1, x2, y2):
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+
+#Boxes at whole numbers on a small area, so many of them share edges, with corners given either way round
+def random_boxes(rng, count, size=100):
+    boxes = []
+    for i in range(count):
+        x, y = rng.randint(0,size), rng.randint(0,size)
+        boxes.append(box(x,y,x + rng.randint(-20,20),y + rng.randint(-20,20)))
+    return(boxes)
+
+def check_batch_collision(boxes, resolved, window=None):
+    expected = [[draw.collision(a,b) for b in resolved] for a in resolved]
+    assert draw.collision_matrix(boxes,window=window).tolist() == expected
+    others = boxes[:20]
+    assert draw.collision_matrix(boxes,others,window).tolist() == [row[:20] for row in expected]
+    assert draw.collision_pairs(boxes,window) == [(i,j) for i in range(len(boxes)) for j in range(i+1,len(boxes)) if expected[i][j]]
+    for i, obj in enumerate(boxes):
+        assert draw.colliding(obj,others,window) == [other for j,other in enumerate(others) if expected[i][j]]
+
+def test_batch_collision_matches_collision():
+    boxes = random_boxes(random.Random(6),80)
+    #Boxes whose edges or corners only touch collide, as they do in collision()
+    boxes += [box(200,200,210,210),box(210,200,220,210),box(220,220,210,210),box(211,211,215,215)]
+    assert [draw.collision(boxes[-4],other) for other in boxes[-3:]] == [True,True,False]
+    check_batch_collision(boxes,boxes)
+
+def test_batch_collision_with_relative_coordinates():
+    window = draw.window(headless=True)
+    rng = random.Random(7)
+    boxes = [box(*[str(rng.randint(0,30)) for i in range(4)]) for j in range(60)]
+    boxes += [box(80,60,"20","20"),box("20","10",200,100)]
+    #collision() compares coordinates as given, so it is checked against the same boxes in px
+    resolved = [box(*draw.make_pos(window,(obj.x1,obj.y1)),*draw.make_pos(window,(obj.x2,obj.y2))) for obj in boxes]
+    check_batch_collision(boxes,resolved,window)
+
+#Check a collision grid's answers against testing every hitbox, worked out in px the same way
+def check_grid(window, grid, shapes):
+    boxes = {obj:draw.hitbox(window,obj.x1,obj.y1,obj.x2,obj.y2) for obj in shapes}
+    overlap = lambda a,b: a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+    expected = {frozenset((a,b)) for i,a in enumerate(shapes) for b in shapes[i+1:] if overlap(boxes[a],boxes[b])}
+    pairs = grid.all_colliding_pairs()
+    assert len(pairs) == len(expected) and {frozenset(pair) for pair in pairs} == expected
+    for obj in shapes:
+        assert set(grid.colliding_with(obj)) == {other for other in shapes if other is not obj and overlap(boxes[obj],boxes[other])}
+    for region in [(0,0,50,50),(120,80,300,90),("10","10","60","40"),(390,290,1000,1000)]:
+        area = draw.hitbox(window,*region)
+        assert set(grid.query_region(*region)) == {obj for obj in shapes if overlap(area,boxes[obj])}
+
+def test_collision_grid_matches_brute_force():
+    window = draw.window(headless=True,size=(400,300))
+    rng = random.Random(5)
+    shapes = []
+    for i in range(60):
+        x, y = rng.randint(0,380), rng.randint(0,280)
+        shapes.append(draw.rect(window,x,y,x + rng.randint(1,90),y + rng.randint(1,40),colours.RED))
+    for i in range(20):
+        x, y = rng.randint(0,90), rng.randint(0,90)
+        shapes.append(draw.rect(window,str(x),str(y),str(x + rng.randint(1,15)),str(y + rng.randint(1,15)),colours.BLUE))
+    #One grid follows every shape in the window, the other only the shapes it is given
+    grid = draw.collision_grid(window,cell_size=32)
+    chosen_shapes = shapes[::2]
+    chosen = draw.collision_grid(window,chosen_shapes,cell_size=50)
+    def check():
+        check_grid(window,grid,shapes)
+        check_grid(window,chosen,chosen_shapes)
+    check()
+    #Moved objects are found in their new cells after update()
+    for obj in shapes[::3]:
+        obj.move(rng.randint(-60,60),rng.randint(-60,60))
+    grid.update()
+    chosen.update()
+    check()
+    #Deleted objects leave the grid following the window, and removed ones leave the other grid
+    for obj in shapes[::4]:
+        draw.delete(obj)
+        if obj in chosen_shapes:
+            chosen.remove(obj)
+            chosen_shapes.remove(obj)
+    shapes = [obj for obj in shapes if obj in window.scene]
+    grid.update()
+    chosen.update()
+    check()
+    #Resizing the window moves every shape with % coordinates
+    window.resize(640,480)
+    window.update()
+    assert (window.width,window.height) == (640,480)
+    grid.update()
+    chosen.update()
+    check()
+
+#A headless window showing a square that changes colour every frame, and the frames it drew
+def recorded_window(path, *args):
+    window = draw.window(headless=True,size=(40,30))
+    square = draw.rect(window,5,5,20,20,colours.RED)
+    recording = window.record(path,*args)
+    frames = []
+    for colour in (colours.RED,colours.GREEN,colours.BLUE):
+        square.colour = colour
+        window.update()
+        frames.append(window.frame().copy())
+    return(window,recording,frames)
+
+def test_record_png():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,"session")
+        window, recording, frames = recorded_window(path)
+        recording.stop()
+        assert (recording.frames,recording.written,recording.dropped) == (3,3,0)
+        assert sorted(os.listdir(path)) == ["frame000000.png","frame000001.png","frame000002.png"]
+        for number, frame in enumerate(frames):
+            with draw.Image.open(os.path.join(path,"frame"+str(number).zfill(6)+".png")) as saved:
+                assert (numpy.asarray(saved) == frame).all()
+
+def test_record_raw():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,"session.rgb")
+        window, recording, frames = recorded_window(path,"raw")
+        #Frames drawn at another size are dropped, so the recording can still be read as one size
+        window.resize(50,40)
+        window.update()
+        recording.stop()
+        assert (recording.frames,recording.written,recording.dropped) == (3,3,1)
+        assert recording.size == (40,30)
+        with open(path,"rb") as file:
+            data = numpy.frombuffer(file.read(),dtype=numpy.uint8)
+        assert (data.reshape(3,30,40,3) == numpy.array(frames)).all()
+
+def test_record_drops_frames_when_buffers_are_full(monkeypatch):
+    #Hold up the writer until every frame has been drawn
+    release = threading.Event()
+    frombytes = draw.Image.frombytes
+    monkeypatch.setattr(draw.Image,"frombytes",lambda *args: release.wait() and frombytes(*args))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,"session")
+        window, recording, frames = recorded_window(path,"png",2)
+        window.update()
+        assert (recording.frames,recording.dropped) == (2,2)
+        release.set()
+        recording.stop()
+        assert recording.written == 2
+        #Dropped frames leave gaps in the numbering
+        assert sorted(os.listdir(path)) == ["frame000000.png","frame000001.png"]
+
+def test_record_raises_writer_errors(monkeypatch):
+    def fail(*args):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(draw.Image,"frombytes",fail)
+    window = draw.window(headless=True,size=(40,30))
+    with tempfile.TemporaryDirectory() as folder:
+        recording = window.record(os.path.join(folder,"session"))
+        #The writer's error is raised from the update after it happens
+        with pytest.raises(OSError,match="No space left"):
+            update_until(window,lambda: False)
+        assert not recording.recording and recording.written == 0
+        #Later frames aren't recorded, and the error is only raised once
+        frames = recording.frames
+        window.update()
+        recording.stop()
+        assert recording.frames == frames
+
+#Time that only moves when the test moves it or something sleeps
+class fake_time:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return(self.now)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def fake_clock(monkeypatch):
+    fake = fake_time()
+    monkeypatch.setattr(draw.time,"perf_counter",fake.perf_counter)
+    monkeypatch.setattr(draw.time,"sleep",fake.sleep)
+    return(fake)
+
+def test_clock_paces_frames(monkeypatch):
+    fake = fake_clock(monkeypatch)
+    timer = draw.clock(4)
+    timer.tick()
+    assert fake.sleeps == [0.25] and timer.delta == 0.25
+    #A frame that took half its time sleeps for the rest
+    fake.now += 0.125
+    timer.tick()
+    assert fake.sleeps[-1] == 0.125 and timer.delta == 0.25
+    #A late frame counts the frames it missed, and timing starts again from it rather than rushing
+    fake.now += 0.875
+    timer.tick()
+    assert len(fake.sleeps) == 2 and timer.delta == 0.875 and timer.dropped == 2
+    fake.now += 0.125
+    timer.tick()
+    assert fake.sleeps[-1] == 0.125 and timer.delta == 0.25
+    assert timer.stats() == {"fps":1/0.40625,"mean":0.40625,"p95":0.25,"p99":0.25,"max":0.875,"busy":0.28125,"dropped":2}
+
+def test_clock_fixed_steps(monkeypatch):
+    fake = fake_clock(monkeypatch)
+    timer = draw.clock()
+    steps = []
+    timer.every(0.25,steps.append)
+    timer.tick()
+    fake.now += 0.625
+    timer.tick()
+    assert steps == [0.25,0.25] and not fake.sleeps
+    #Time left over from one frame counts towards the next step
+    fake.now += 0.125
+    timer.tick()
+    assert len(steps) == 3
+    #After a long pause only 8 steps are caught up, and the rest of the pause is skipped
+    fake.now += 10
+    timer.tick()
+    assert len(steps) == 11
+    fake.now += 0.125
+    timer.tick()
+    assert len(steps) == 11
+    timer.cancel(steps.append)
+    fake.now += 1
+    timer.tick()
+    assert len(steps) == 11
+
+def test_window_frame_rate(monkeypatch):
+    fake = fake_clock(monkeypatch)
+    window = draw.window(headless=True,fps=64)
+    for frame in range(3):
+        window.update()
+    assert window.delta == window.clock.delta == 1/64
+    assert window.clock.frames == 3 and len(fake.sleeps) == 3
+
+#Frames of the same scene drawn straight onto the window and with SDL's software renderer
+def test_renderer_matches_surface():
+    with tempfile.TemporaryDirectory() as folder:
+        opaque = make_image(folder)
+        clear = os.path.join(folder,"clear.png")
+        draw.Image.new("RGBA",(20,10),(255,0,255,128)).save(clear)
+        frames = []
+        for renderer in (False,"software"):
+            window = draw.window("test",(200,150),renderer=renderer)
+            box = draw.rect(window,10,10,60,40,colours.RED,colours.WHITE,3)
+            draw.line(window,5,140,190,20,colours.YELLOW)
+            draw.line(window,0,75,199,75,colours.BLUE)
+            draw.text(window,80,10,16,colours.WHITE,"Parity",fonts.Arial)
+            draw.image(window,opaque,100,60,20)
+            draw.image(window,clear,"60","70","10")
+            draw.textbox(window,10,100,14,80,fonts.Arial)
+            window.update()
+            first = window.frame().copy()
+            #Renderers draw every frame from scratch, so a changed scene is checked too
+            box.move(30,20)
+            window.update()
+            frames.append((first,window.frame().copy()))
+        for surface, rendered in zip(*frames):
+            assert (surface == rendered).all()
+        assert tuple(frames[1][1][35,50]) == colours.RED
+
+def test_culling_in_each_origin():
+    for origin in range(5):
+        frames = []
+        for culling in (True,False):
+            window = draw.window(headless=True,size=(200,100),origin=origin,culling=culling)
+            #On screen, or partly on screen, in every origin
+            draw.rect(window,10,10,30,30,colours.RED)
+            draw.rect(window,"10","10","30","30",colours.GREEN)
+            draw.rect(window,-10,-10,15,15,colours.BLUE)
+            #Off screen behind the origin, or past the far edges
+            draw.rect(window,-150,-150,-120,-120,colours.RED)
+            draw.rect(window,"-60","-60","-55","-55",colours.RED)
+            draw.rect(window,250,150,300,200,colours.RED)
+            draw.rect(window,"110","110","120","120",colours.RED)
+            draw.text(window,400,300,16,colours.WHITE,"Far away",fonts.Arial)
+            window.update()
+            frames.append(window.frame().copy())
+            assert window.culled == (5 if culling else 0)
+        #Culled shapes wouldn't have been seen anyway
+        assert (frames[0] == frames[1]).all() and frames[0].any()
+    #Only shapes overlapping the viewport, given in the window's coordinate system, are kept
+    window.culling = True
+    window.viewport = (0,0,15,15)
+    culled = draw.counters["shapes culled"]
+    window.update()
+    assert window.culled == 6 and draw.counters["shapes culled"] - culled == 6